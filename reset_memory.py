@@ -4,6 +4,7 @@ from pathlib import Path
 # Define paths
 xeno_dir = Path.home() / ".xeno"
 xeno_database_path = xeno_dir / "memories.sqlite"
+xeno_index_path = xeno_dir / "memories.hnsw"
 xeno_files_path = xeno_dir / "memory_files"
 
 # Delete the xeno_db_path file
@@ -11,6 +12,11 @@ if xeno_database_path.exists() and xeno_database_path.is_file():
     xeno_database_path.unlink()
     print(f"Deleted database: {xeno_database_path}")
 
+# Delete the HNSW index next to it
+if xeno_index_path.exists() and xeno_index_path.is_file():
+    xeno_index_path.unlink()
+    print(f"Deleted index: {xeno_index_path}")
+
 # Delete the xeno_files_path directory and its contents
 if xeno_files_path.exists() and xeno_files_path.is_dir():
     shutil.rmtree(xeno_files_path)
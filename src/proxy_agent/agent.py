@@ -12,7 +12,7 @@ from src.proxy_agent.prompts import (
     USER_PROMPT,
     USER_PROMPT_PARSE_CODE_ERROR,
 )
-from src.utils.llm import LLM
+from src.utils.llm import CompletionLLM
 from src.utils.local_python_interpreter import LocalPythonInterpreter
 from src.utils.tool import Tool
 from src.utils.messages import AssistantMessage, Message, SystemMessage, UserMessage
@@ -81,16 +81,14 @@ class ProxyAgent:
 
     def _initialize_llm(self):
         """
-        Initialize the LLM instance with the current parameters.
+        Initialize the completion LLM with the current parameters.
         """
-        self.llm = LLM(
-            completion_model_id=self.completion_model_id,
-            completion_api_base=self.completion_api_base,
-            completion_api_key=self.completion_api_key,
-            embedding_model_id=self.embedding_model_id,
-            embedding_api_base=self.embedding_api_base,
-            embedding_api_key=self.embedding_api_key,
-            completion_requests_per_minute=5,
+        # Each agent has its own instance, and with it its own requests per minute budget
+        self.llm = CompletionLLM(
+            model_id=self.completion_model_id,
+            api_base=self.completion_api_base,
+            api_key=self.completion_api_key,
+            requests_per_minute=5,
         )
         logging.debug("LLM instance initialized.")
 
@@ -370,10 +368,9 @@ class ProxyAgent:
         **kwargs,
     ):
         """
-        Update the embedding model parameters and reinitialize the LLM.
+        Update the embedding model parameters.
         """
         self.embedding_model_id = embedding_model_id
         self.embedding_api_base = embedding_api_base
         self.embedding_api_key = embedding_api_key
         logging.debug("Embedding model parameters updated.")
-        self._initialize_llm()
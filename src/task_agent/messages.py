@@ -2,16 +2,22 @@ from src.utils.messages import AssistantMessage, UserMessage
 
 
 class ErrorMessage(UserMessage):
+    __slots__ = ()
+
     def __init__(self, error: str):
         super().__init__(f"[ERROR] {error}\n")
 
 
 class TaskMessage(UserMessage):
+    __slots__ = ()
+
     def __init__(self, task: str):
         super().__init__(f"[TASK] {task}")
 
 
 class PlanMessage(AssistantMessage):
+    __slots__ = ()
+
     def __init__(self, facts: str, plan: str):
         super().__init__(
             f"[FACTS] {facts.strip()}\n[PLAN] {plan.strip()}",
@@ -19,14 +25,20 @@ class PlanMessage(AssistantMessage):
 
 
 class ToolErrorMessage(UserMessage):
+    __slots__ = ()
+
     def __init__(self, error: str):
         super().__init__(f"[TOOL ERROR] {error}\n")
 
 class StepResultMessage(AssistantMessage):
+    __slots__ = ()
+
     def __init__(self, result: str):
         super().__init__(f"[STEP RESULT] {result}")
 
 
 class FinalAnswerMessage(AssistantMessage):
+    __slots__ = ()
+
     def __init__(self, answer: str):
         super().__init__(f"[FINAL ANSWER] {answer}")
@@ -2,11 +2,14 @@ import logging
 import os
 import uuid
 import asyncio
-from typing import Dict, Optional
+import hashlib
+from collections import OrderedDict
+from typing import Dict, Optional, Set
 from dotenv import load_dotenv
 
 from browser_use import (
     Agent as BrowserUseAgent,
+    AgentHistoryList,
     Browser as BrowserUseBrowser,
     BrowserConfig as BrowserUseConfig,
 )
@@ -30,17 +33,42 @@ class Browser:
         api_base: Optional[str],
         api_key: Optional[str],
         headless: bool = False,
+        context_pool_size: int = 4,
+        prewarm_count: int = 1,
+        cache_results: bool = False,
+        cache_size: int = 1024,
     ):
         """
         :param headless: Whether to run the browser in headless mode.
+        :param context_pool_size: How many ready browser contexts to keep around for new sessions.
+        :param prewarm_count: How many browser contexts to create in the background on start.
+        :param cache_results: Whether to return cached results for tasks that were already run.
+            Only enable this for tasks whose outcome does not depend on live website state.
+        :param cache_size: The maximum number of cached task results.
         """
         self.model_id = model_id
         self.api_base = api_base
         self.api_key = api_key
         self.headless = headless
+        self.prewarm_count = prewarm_count
         self.browser: Optional[Browser] = None
         self.sessions: Dict[str, BrowserContext] = {}
         self.sessions_lock = asyncio.Lock()
+        # A browser context can only be driven by one agent at a time
+        self._session_locks: Dict[str, asyncio.Lock] = {}
+        # Fresh contexts (and those of sessions that never ran a task) wait here for create_session
+        self._context_pool: asyncio.LifoQueue[BrowserContext] = asyncio.LifoQueue(
+            maxsize=context_pool_size
+        )
+        # Sessions that ran a task, their context holds state of that task and isn't reused
+        self._used_sessions: Set[str] = set()
+        self._prewarm_tasks: Set[asyncio.Task] = set()
+        # Limits how many contexts are closed concurrently on stop
+        self._close_semaphore = asyncio.Semaphore(8)
+        self.cache_results = cache_results
+        self.cache_size = cache_size
+        # LRU cache of task results, keyed by the hash of the model, endpoint and task
+        self._result_cache: OrderedDict[str, AgentHistoryList] = OrderedDict()
 
     async def start(self) -> None:
         """
@@ -56,9 +84,49 @@ class Browser:
             self.browser = BrowserUseBrowser(config=browser_config)
             logging.debug("Browser launched successfully.")
         except Exception as e:
-            logging.debug(f"Failed to launch browser: {e}")
+            logging.debug("Failed to launch browser: %s", e)
             raise e
 
+        # Warm up contexts off the critical path of the first create_session
+        self._start_prewarm(self.prewarm_count)
+
+    def _start_prewarm(self, n: int) -> None:
+        """
+        Create up to n browser contexts for the context pool in a background task.
+        :param n: The number of contexts to create.
+        """
+        task = asyncio.create_task(self._prewarm(n=n))
+        self._prewarm_tasks.add(task)
+        task.add_done_callback(self._prewarm_tasks.discard)
+
+    async def _prewarm(self, n: int) -> None:
+        """
+        Create up to n browser contexts and put them into the context pool.
+        :param n: The number of contexts to create.
+        """
+        for _ in range(n):
+            if self.browser is None or self._context_pool.full():
+                return
+            context = None
+            try:
+                context = await self.browser.new_context()
+                # Initializing the session launches the underlying playwright context
+                await context.get_session()
+            except asyncio.CancelledError:
+                # Cancelled by stop(), the context isn't in the pool yet, so close it here
+                if context is not None:
+                    await self._close_context("Pre-warming browser context", context)
+                raise
+            except Exception as e:
+                logging.debug("Failed to pre-warm browser context: %s", e)
+                return
+            try:
+                self._context_pool.put_nowait(context)
+            except asyncio.QueueFull:
+                await context.close()
+                return
+            logging.debug("Pre-warmed browser context added to pool.")
+
     async def stop(self) -> None:
         """
         Close all active browser contexts and the Browser instance.
@@ -67,20 +135,45 @@ class Browser:
         if not self.browser:
             return  # Browser is already stopped or was never started
 
+        # Wait for cancelled pre-warm tasks, so their contexts are pooled or closed before the pool is drained
+        prewarm_tasks = list(self._prewarm_tasks)
+        for task in prewarm_tasks:
+            task.cancel()
+        await asyncio.gather(*prewarm_tasks, return_exceptions=True)
+
         async with self.sessions_lock:
-            session_ids = list(self.sessions.keys())
-            for session_id in session_ids:
-                context = self.sessions.pop(session_id)
-                try:
-                    await context.close()
-                    logging.debug(f"Browser context {session_id} closed.")
-                except Exception as e:
-                    logging.debug(f"Failed to close browser context {session_id}: {e}")
+            sessions = dict(self.sessions)
+            self.sessions.clear()
+            self._session_locks.clear()
+            self._used_sessions.clear()
+
+        tasks = [
+            self._close_context(f"Browser context {session_id}", context)
+            for session_id, context in sessions.items()
+        ]
+        while not self._context_pool.empty():
+            tasks.append(
+                self._close_context("Pooled browser context", self._context_pool.get_nowait())
+            )
+        await asyncio.gather(*tasks, return_exceptions=True)
 
         await self.browser.close()
         self.browser = None
         logging.debug("Browser closed successfully.")
 
+    async def _close_context(self, label: str, context: BrowserContext) -> None:
+        """
+        Close a single browser context, bounded by the close semaphore.
+        :param label: A description of the context used for logging.
+        :param context: The browser context to close.
+        """
+        async with self._close_semaphore:
+            try:
+                await context.close()
+                logging.debug("%s closed.", label)
+            except Exception as e:
+                logging.debug("Failed to close %s: %s", label, e)
+
     async def create_session(self) -> str:
         """
         Create a new browser session (context) and return the session ID.
@@ -92,52 +185,85 @@ class Browser:
         session_id = str(uuid.uuid4())
 
         try:
-            # Create a new browser context
-            context = await self.browser.new_context()
-        except Exception as e:
-            raise RuntimeError(f"Failed to create browser session: {str(e)}")
+            # Reuse a pooled browser context if available, otherwise create a new one
+            context = self._context_pool.get_nowait()
+        except asyncio.QueueEmpty:
+            try:
+                context = await self.browser.new_context()
+            except Exception as e:
+                raise RuntimeError(f"Failed to create browser session: {str(e)}")
 
         async with self.sessions_lock:
             self.sessions[session_id] = context
+            self._session_locks[session_id] = asyncio.Lock()
 
-        logging.debug(f"Session {session_id} created.")
+        logging.debug("Session %s created.", session_id)
         return session_id
 
     async def terminate_session(self, session_id: str) -> None:
         """
         Terminate and remove the specified browser session.
+        A context that ran a task is closed, cookies, storage (local, session, IndexedDB) and
+        open pages of that task must not carry over to another session. A fresh context is
+        created in the background to take its place in the pool.
         :param session_id: The ID of the session to terminate.
         """
         async with self.sessions_lock:
             context = self.sessions.pop(session_id, None)
+            session_lock = self._session_locks.pop(session_id, None)
+            used = session_id in self._used_sessions
+            self._used_sessions.discard(session_id)
 
         if not context:
             raise ValueError(f"Session {session_id} not found")
 
-        try:
-            await context.close()
-            logging.debug(f"Session {session_id} terminated successfully.")
-        except Exception as e:
-            raise RuntimeError(
-                f"Failed to close browser session {session_id}: {str(e)}"
-            )
-
-    async def use(self, session_id: str, task: str) -> str:
+        # Wait for a task that is still running in this session
+        async with session_lock:
+            if not used:
+                try:
+                    self._context_pool.put_nowait(context)
+                    logging.debug("Session %s terminated and its unused context pooled.", session_id)
+                    return
+                except asyncio.QueueFull:
+                    pass
+
+            try:
+                await context.close()
+                logging.debug("Session %s terminated successfully.", session_id)
+            except Exception as e:
+                raise RuntimeError(
+                    f"Failed to close browser session {session_id}: {str(e)}"
+                )
+            finally:
+                if used:
+                    self._start_prewarm(1)
+
+    async def use(self, session_id: str, task: str) -> AgentHistoryList:
         """
         Execute a task within the specified browser session.
         :param session_id: The ID of the session to use.
         :param task: The text describing the task to execute.
-        :return: The result string from the executed task.
+        :return: The history of the executed task.
         """
         if not task:
             raise ValueError("Task cannot be empty")
 
-        async with self.sessions_lock:
-            context = self.sessions.get(session_id)
+        # Plain dict reads need no lock, there is no await between lookup and use
+        context = self.sessions.get(session_id)
+        session_lock = self._session_locks.get(session_id)
 
         if not context:
             raise ValueError(f"Session {session_id} not found")
 
+        # The same task can give a different result with another model or endpoint
+        cache_key = hashlib.sha256(
+            "\0".join((self.model_id, self.api_base or "", task)).encode()
+        ).hexdigest()
+        if self.cache_results and cache_key in self._result_cache:
+            self._result_cache.move_to_end(cache_key)
+            logging.debug("Returning cached result for task: %s", task)
+            return self._result_cache[cache_key]
+
         # Initialize the language model
         # TODO remove when fixed - the if / else block is a temporary workaround for https://github.com/langchain-ai/langchain/issues/29308
         if self.model_id.startswith("gemini"):
@@ -164,20 +290,28 @@ class Browser:
         )
 
         try:
-            result = await agent.run()
-            logging.debug(f"Browser Agent Result: {result}")
-            return result
+            # Tasks in the same session run one after another, other sessions are not blocked
+            async with session_lock:
+                self._used_sessions.add(session_id)
+                result = await agent.run()
+            logging.debug("Browser Agent Result: %s", result)
         except Exception as e:
-            logging.debug(f"An error occured during Browser.use: {str(e)}")
+            logging.debug("An error occured during Browser.use: %s", e)
             raise RuntimeError(str(e))
 
+        if self.cache_results:
+            self._result_cache[cache_key] = result
+            if len(self._result_cache) > self.cache_size:
+                self._result_cache.popitem(last=False)
+
+        return result
+
     async def list_sessions(self) -> Dict[str, str]:
         """
         List all active sessions.
         :return: A dict of {session_id: "active"} for each active session.
         """
-        async with self.sessions_lock:
-            return {session_id: "active" for session_id in self.sessions}
+        return {session_id: "active" for session_id in self.sessions}
 
 
 # Example usage
@@ -192,16 +326,16 @@ async def main():
 
     # Create a new session
     session_id = await browser.create_session()
-    logging.debug("Created session:", session_id)
+    logging.debug("Created session: %s", session_id)
 
     # Use the session to execute a task
     try:
         result = await browser.use(
             session_id, "Open the example website and summarize its content."
         )
-        logging.debug("Result:", result)
+        logging.debug("Result: %s", result)
     except Exception as e:
-        logging.debug("Error executing task:", e)
+        logging.debug("Error executing task: %s", e)
 
     # Terminate the session
     await browser.terminate_session(session_id)
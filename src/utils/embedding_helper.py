@@ -1,7 +1,14 @@
+import math
+import threading
+from functools import cached_property, lru_cache
 from pathlib import Path
+from typing import Dict, List, Optional, Tuple
 import numpy as np
 import torch
+import torch.nn.functional as F
 import torchvision
+from torchvision.io import ImageReadMode, decode_image, decode_jpeg
+from torchvision.transforms.functional import pil_to_tensor
 from PIL import Image
 import torchaudio
 from io import BytesIO
@@ -12,11 +19,6 @@ from src.utils.audioclip import AudioCLIP
 xeno_models_dir = Path.home() / ".xeno" / "models"
 xeno_audioclip_models_dir = xeno_models_dir / "audioclip"
 
-class ToTensor1D(torchvision.transforms.ToTensor):
-    def __call__(self, tensor: np.ndarray):
-        tensor_2d = super(ToTensor1D, self).__call__(tensor[..., np.newaxis])
-        return tensor_2d.squeeze_(0)
-
 class EmbeddingHelper:
     def __init__(
         self,
@@ -25,40 +27,84 @@ class EmbeddingHelper:
         image_size: int = 224,
         image_mean: tuple = (0.48145466, 0.4578275, 0.40821073),
         image_std: tuple = (0.26862954, 0.26130258, 0.27577711),
-        device: str = None
+        device: str = None,
+        use_amp: Optional[bool] = None,
+        text_cache_size: int = 4096,
+        compile_encoders: bool = False
     ):
         """
         Initializes the AudioCLIP model and defines necessary transformations.
+
+        :param use_amp: Whether to run the model under autocast (fp16 on CUDA, bf16 on CPU).
+                        Defaults to True on CUDA and False on CPU.
+        :param text_cache_size: How many text embeddings to keep in the LRU cache (0 disables it).
+        :param compile_encoders: Whether to compile the image, audio and text encoders with torch.compile.
+                                 The first call per input shape is slow, later calls are faster.
         """
         # Device configuration
         self.device = device if device else ('cuda' if torch.cuda.is_available() else 'cpu')
+        self._device_type = torch.device(self.device).type
+
+        # Mixed precision configuration
+        self.use_amp = use_amp if use_amp is not None else self._device_type == 'cuda'
+        self._amp_dtype = torch.float16 if self._device_type == 'cuda' else torch.bfloat16
 
         # Load the pre-trained AudioCLIP model
         self.model = AudioCLIP(pretrained=str(model_path)).to(self.device)
+        self.model_name = Path(model_path).stem
         self.model.eval()
-        torch.set_grad_enabled(False)
+
+        # Compile the heavy sub-modules in place, encode_* pick them up transparently.
+        # Batch sizes and audio lengths vary, so the graphs are compiled with dynamic shapes.
+        if compile_encoders:
+            self.model.visual.compile(dynamic=True)
+            self.model.audio.compile(dynamic=True)
+            self.model.transformer.compile(dynamic=True)
 
         # Expose the vector dimension
         self.vector_dim = self.model.embed_dim
 
-        # Audio transformation
-        self.audio_transforms = ToTensor1D()
-
-        # Image transformation
-        self.image_transforms = torchvision.transforms.Compose([
-            torchvision.transforms.ToTensor(),
-            torchvision.transforms.Resize(image_size, interpolation=Image.BICUBIC),
+        # Image transformation, scripted tensor ops that run on self.device
+        self.image_transforms = torch.jit.script(torch.nn.Sequential(
+            torchvision.transforms.ConvertImageDtype(torch.float32),
+            torchvision.transforms.Resize(
+                image_size,
+                interpolation=torchvision.transforms.InterpolationMode.BICUBIC,
+                antialias=True,
+            ),
             torchvision.transforms.CenterCrop(image_size),
             torchvision.transforms.Normalize(image_mean, image_std)
-        ])
+        )).to(self.device)
 
         # Constants
         self.sample_rate = sample_rate
 
-        # Obtain logit scales (not strictly required for embedding, but OK to keep)
-        self.scale_audio_image = torch.clamp(self.model.logit_scale_ai.exp(), min=1.0, max=100.0).to(self.device)
-        self.scale_audio_text = torch.clamp(self.model.logit_scale_at.exp(), min=1.0, max=100.0).to(self.device)
-        self.scale_image_text = torch.clamp(self.model.logit_scale.exp(), min=1.0, max=100.0).to(self.device)
+        # Resamplers keyed by (orig_freq, new_freq), their sinc kernels are computed once
+        self._resamplers: Dict[Tuple[int, int], torchaudio.transforms.Resample] = {}
+
+        # Reusable flat input buffers per modality on self.device, grown on demand.
+        # The lock keeps concurrent calls from filling the same buffer.
+        self._input_buffers: Dict[str, torch.Tensor] = {}
+        self._input_lock = threading.Lock()
+
+        # Text embeddings are cached on the CPU, the same queries are embedded over and over
+        self._embed_text_cpu = lru_cache(maxsize=text_cache_size)(self._embed_text_uncached)
+
+    # Logit scales are not needed for embedding, they are only materialized on first access
+    @cached_property
+    def scale_audio_image(self) -> torch.Tensor:
+        with torch.inference_mode():
+            return torch.clamp(self.model.logit_scale_ai.exp(), min=1.0, max=100.0)
+
+    @cached_property
+    def scale_audio_text(self) -> torch.Tensor:
+        with torch.inference_mode():
+            return torch.clamp(self.model.logit_scale_at.exp(), min=1.0, max=100.0)
+
+    @cached_property
+    def scale_image_text(self) -> torch.Tensor:
+        with torch.inference_mode():
+            return torch.clamp(self.model.logit_scale.exp(), min=1.0, max=100.0)
 
     def _load_image(self, image_path: str) -> Image.Image:
         """
@@ -71,80 +117,237 @@ class EmbeddingHelper:
         Loads an audio file, resamples it if necessary, and returns as a tensor.
         """
         waveform, original_sample_rate = torchaudio.load(audio_path)  # [channels, samples]
-        
-        # If stereo, convert to mono
-        if waveform.shape[0] > 1:
+        return self._to_mono(waveform, original_sample_rate)
+
+    def _to_mono(self, waveform: torch.Tensor, original_sample_rate: int) -> torch.Tensor:
+        """
+        Moves a [channels, samples] waveform to self.device, mixes it down to mono and
+        resamples it there. Returns a 1D waveform at self.sample_rate.
+        """
+        # Copy once, the mixdown and the resampling convolution both run on the device
+        waveform = self._pin(waveform).to(self.device, non_blocking=True)
+
+        # If stereo, convert to mono. Two channels are averaged without a reduction kernel.
+        if waveform.shape[0] == 2:
+            waveform = (waveform[0:1] + waveform[1:2]).mul_(0.5)
+        elif waveform.shape[0] > 2:
             waveform = torch.mean(waveform, dim=0, keepdim=True)
-        
+
         # Resample if sample rates differ
         if original_sample_rate != self.sample_rate:
-            resampler = torchaudio.transforms.Resample(orig_freq=original_sample_rate, new_freq=self.sample_rate)
-            waveform = resampler(waveform)
+            waveform = self._resample(waveform, original_sample_rate)
 
         # Make it 1D
-        waveform = waveform.squeeze(0)  # shape: [samples]
-        return waveform
+        return waveform.squeeze(0)  # shape: [samples]
+
+    def _resample(self, waveform: torch.Tensor, original_sample_rate: int) -> torch.Tensor:
+        """
+        Resamples a waveform to self.sample_rate on self.device, reusing a cached resampler.
+        """
+        key = (original_sample_rate, self.sample_rate)
+        resampler = self._resamplers.get(key)
+        if resampler is None:
+            resampler = torchaudio.transforms.Resample(
+                orig_freq=original_sample_rate, new_freq=self.sample_rate
+            ).to(self.device)
+            self._resamplers[key] = resampler
+        return resampler(waveform.to(self.device))
+
+    def _pin(self, tensor: torch.Tensor) -> torch.Tensor:
+        """
+        Returns the tensor in pinned host memory when copying to CUDA, so the copy can be asynchronous.
+        """
+        if self._device_type == 'cuda' and tensor.device.type == 'cpu':
+            return tensor.pin_memory()
+        return tensor
+
+    def _forward(
+        self,
+        audio: Optional[torch.Tensor] = None,
+        image: Optional[torch.Tensor] = None,
+        text: Optional[List[str]] = None,
+    ) -> Tuple[Optional[torch.Tensor], ...]:
+        """
+        Runs the encoders for the given inputs under autocast (if enabled) and returns the
+        unnormalized (audio, image, text) features in fp32.
+
+        The encoders are called directly, AudioCLIP.forward would also compute the logits
+        and the loss, which embedding never needs.
+        """
+        features = [None, None, None]
+        with torch.autocast(self._device_type, dtype=self._amp_dtype, enabled=self.use_amp):
+            if audio is not None:
+                features[0] = self.model.encode_audio(audio)
+            if image is not None:
+                features[1] = self.model.encode_image(image)
+            if text is not None:
+                features[2] = self.model.encode_text(text)
+        return tuple(f.float() if f is not None else None for f in features)
 
     def create_text_embedding(self, text: str) -> torch.Tensor:
         """
-        Creates normalized text embedding from a single text string.
+        Creates normalized text embedding of shape [D] from a single text string.
+        The embedding stays on the CPU, where callers convert it to numpy anyway.
+        Short texts are served from an LRU cache, the returned tensor must not be modified in place.
+        """
+        if len(text) < 512:
+            text_features = self._embed_text_cpu(text)
+        else:
+            text_features = self._embed_text_uncached(text)
+
+        return text_features.squeeze(0)
+
+    @torch.inference_mode()
+    def _embed_text_uncached(self, text: str) -> torch.Tensor:
+        """
+        Embeds a single text string and returns the normalized [1, D] features on the CPU (pinned on CUDA).
         """
         # Prepare the input as a list containing the single text
         text_inputs = [text]
 
         # Pass the input through the model and extract features
-        _, _, text_features = self.model(text=text_inputs)[0][0]
+        _, _, text_features = self._forward(text=text_inputs)
 
         # Normalize the features
-        text_features = text_features / text_features.norm(dim=-1, keepdim=True)
+        return self._pin(F.normalize(text_features, dim=-1).cpu())
 
-        # Return the normalized features to the specified device
-        return text_features.to(self.device)
+    @torch.inference_mode()
+    def create_text_embeddings(self, texts: List[str]) -> torch.Tensor:
+        """
+        Creates normalized text embeddings for a list of text strings in a single forward pass.
+        Returns a tensor of shape [len(texts), D].
+        """
+        _, _, text_features = self._forward(text=texts)
+        return F.normalize(text_features, dim=-1)
 
     def create_image_embedding(self, image: Image.Image) -> torch.Tensor:
         """
         Creates a normalized image embedding from a PIL.Image object.
         """
-        # Ensure the image is in RGB format
-        image = image.convert('RGB')
-        
-        # Apply transforms
-        image_tensor = self.image_transforms(image).unsqueeze(0).to(self.device)
-        
-        # Get image features
-        _, image_features, _ = self.model(image=image_tensor)[0][0]
-        
-        # Normalize
-        image_features = image_features / image_features.norm(dim=-1, keepdim=True)
-        
-        return image_features.squeeze(0)
+        return self.create_image_embeddings([image])[0]
 
-    def create_audio_embedding(self, audio_buffer: BytesIO) -> torch.Tensor:
+    @torch.inference_mode()
+    def create_image_embeddings(self, images: List[Image.Image]) -> torch.Tensor:
         """
-        Creates a normalized audio embedding from a BytesIO object containing WAV data.
+        Creates normalized image embeddings for a list of PIL.Image objects in a single forward pass.
+        Returns a tensor of shape [len(images), D].
+        """
+        # Ensure RGB format, move the uint8 pixels to the device, transform there and stack into one batch.
+        # Copies from pinned memory are asynchronous, so they overlap with decoding the next image.
+        return self._embed_image_tensors(
+            [
+                self._pin(pil_to_tensor(image.convert('RGB'))).to(self.device, non_blocking=True)
+                for image in images
+            ]
+        )
+
+    def create_image_embedding_from_array(self, array: np.ndarray) -> torch.Tensor:
+        """
+        Creates a normalized image embedding from a uint8 RGB array of shape [H, W, 3].
+        """
+        return self.create_image_embeddings_from_arrays([array])[0]
+
+    @torch.inference_mode()
+    def create_image_embeddings_from_arrays(self, arrays: List[np.ndarray]) -> torch.Tensor:
+        """
+        Creates normalized image embeddings for a list of uint8 RGB arrays [H, W, 3] in a single forward pass.
+        Contiguous arrays are wrapped without a copy, the channels are moved to the front on the device.
+        Returns a tensor of shape [len(arrays), D].
+        """
+        return self._embed_image_tensors(
+            [
+                self._pin(torch.from_numpy(np.ascontiguousarray(array)))
+                .to(self.device, non_blocking=True)
+                .permute(2, 0, 1)
+                for array in arrays
+            ]
+        )
+
+    def create_image_embedding_from_bytes(self, image_bytes: bytes) -> torch.Tensor:
+        """
+        Creates a normalized image embedding from encoded image bytes (PNG, JPEG, ...), without going through PIL.
+        """
+        return self.create_image_embeddings_from_bytes([image_bytes])[0]
+
+    @torch.inference_mode()
+    def create_image_embeddings_from_bytes(self, images_bytes: List[bytes]) -> torch.Tensor:
+        """
+        Creates normalized image embeddings for a list of encoded images in a single forward pass.
+        Returns a tensor of shape [len(images_bytes), D].
+        """
+        return self._embed_image_tensors([self._decode_image(image_bytes) for image_bytes in images_bytes])
+
+    def _decode_image(self, image_bytes: bytes) -> torch.Tensor:
+        """
+        Decodes an encoded image into a uint8 RGB tensor [3, H, W] on self.device.
+        JPEGs are decoded on the GPU (nvjpeg) when running on CUDA.
+        """
+        data = torch.frombuffer(bytearray(image_bytes), dtype=torch.uint8)
+        if self._device_type == 'cuda' and image_bytes[:3] == b'\xff\xd8\xff':
+            return decode_jpeg(data, mode=ImageReadMode.RGB, device=self.device)
+        image = decode_image(data, mode=ImageReadMode.RGB)
+        return self._pin(image).to(self.device, non_blocking=True)
+
+    def _input_buffer(self, modality: str, shape: Tuple[int, ...]) -> torch.Tensor:
+        """
+        Returns a contiguous float32 view of the given shape into the reusable input buffer of a modality.
+        The buffer only grows, so steady-state calls allocate nothing. Callers must hold self._input_lock.
+        """
+        numel = math.prod(shape)
+        buffer = self._input_buffers.get(modality)
+        if buffer is None or buffer.numel() < numel:
+            buffer = torch.empty(numel, dtype=torch.float32, device=self.device)
+            self._input_buffers[modality] = buffer
+        return buffer[:numel].view(shape)
+
+    def _embed_image_tensors(self, images: List[torch.Tensor]) -> torch.Tensor:
+        """
+        Transforms uint8 RGB tensors already on self.device, stacks them and embeds them in one forward pass.
+        """
+        transformed = [self.image_transforms(image) for image in images]
+
+        with self._input_lock:
+            image_tensor = self._input_buffer('image', (len(transformed), *transformed[0].shape))
+            torch.stack(transformed, dim=0, out=image_tensor)
+
+            # Get image features
+            _, image_features, _ = self._forward(image=image_tensor)
+
+        return F.normalize(image_features, dim=-1)
+
+    def _prepare_audio(self, audio_buffer: BytesIO) -> torch.Tensor:
+        """
+        Loads WAV data from a BytesIO object as a 1D mono waveform at self.sample_rate.
         """
         # Load audio from the BytesIO buffer
         waveform, original_sample_rate = torchaudio.load(audio_buffer)  # [channels, samples]
+        return self._to_mono(waveform, original_sample_rate)
 
-        # If stereo, convert to mono
-        if waveform.shape[0] > 1:
-            waveform = torch.mean(waveform, dim=0, keepdim=True)
+    def create_audio_embedding(self, audio_buffer: BytesIO) -> torch.Tensor:
+        """
+        Creates a normalized audio embedding from a BytesIO object containing WAV data.
+        """
+        return self.create_audio_embeddings([audio_buffer])[0]
 
-        # Resample if needed
-        if original_sample_rate != self.sample_rate:
-            resampler = torchaudio.transforms.Resample(orig_freq=original_sample_rate, new_freq=self.sample_rate)
-            waveform = resampler(waveform)
+    @torch.inference_mode()
+    def create_audio_embeddings(self, audio_buffers: List[BytesIO]) -> torch.Tensor:
+        """
+        Creates normalized audio embeddings for a list of BytesIO objects containing WAV data
+        in a single forward pass. Shorter clips are zero-padded to the longest one.
+        Returns a tensor of shape [len(audio_buffers), D].
+        """
+        waveforms = [self._prepare_audio(audio_buffer) for audio_buffer in audio_buffers]
 
-        # Make it 1D
-        waveform = waveform.squeeze(0)
-
-        # Transform
-        audio_tensor = self.audio_transforms(waveform.unsqueeze(0)).unsqueeze(0).to(self.device)  # shape: [1, 1, samples]
-
-        # Get audio features
-        audio_features, _, _ = self.model(audio=audio_tensor)[0][0]
-        
-        # Normalize
-        audio_features = audio_features / audio_features.norm(dim=-1, keepdim=True)
-        
-        return audio_features.squeeze(0)
+        with self._input_lock:
+            # Pad to the longest clip and add the channel dimension -> [B, 1, samples]
+            # The waveforms are already on self.device.
+            max_length = max(waveform.shape[0] for waveform in waveforms)
+            audio_tensor = self._input_buffer('audio', (len(waveforms), 1, max_length))
+            audio_tensor.zero_()
+            for i, waveform in enumerate(waveforms):
+                audio_tensor[i, 0, :waveform.shape[0]].copy_(waveform)
+
+            # Get audio features
+            audio_features, _, _ = self._forward(audio=audio_tensor)
+
+        return F.normalize(audio_features, dim=-1)
@@ -1,6 +1,8 @@
 
 
-from src.utils.file_storage_backends import LocalStorageBackend, S3StorageBackend, StorageBackend
+from typing import Iterable, Iterator, Tuple
+
+from src.utils.file_storage_backends import READ_CHUNK_SIZE, LocalStorageBackend, S3StorageBackend, StorageBackend
 
 
 class FileStorage:
@@ -21,6 +23,14 @@ class FileStorage:
         """
         self.backend.save_file(file_ref, data)
 
+    def save_many(self, files: Iterable[Tuple[str, bytes]]) -> None:
+        """
+        Save several files to the configured storage backend.
+
+        :param files: (file reference, file data) pairs
+        """
+        self.backend.save_many(files)
+
     def read_file(self, file_ref: str) -> bytes:
         """
         Read a file from the configured storage backend.
@@ -30,6 +40,33 @@ class FileStorage:
         """
         return self.backend.read_file(file_ref)
 
+    def iter_file(self, file_ref: str, chunk_size: int = READ_CHUNK_SIZE) -> Iterator[bytes]:
+        """
+        Stream a file from the configured storage backend in chunks.
+
+        :param file_ref: File reference
+        :param chunk_size: Maximum size of each chunk in bytes
+        :return: Iterator over the file data
+        """
+        return self.backend.iter_file(file_ref, chunk_size)
+
+    def move_file(self, file_ref: str, new_file_ref: str) -> None:
+        """
+        Move a file to a new reference within the configured storage backend.
+
+        :param file_ref: Current file reference
+        :param new_file_ref: New file reference
+        """
+        self.backend.move_file(file_ref, new_file_ref)
+
+    def delete_file(self, file_ref: str) -> None:
+        """
+        Delete a file from the configured storage backend.
+
+        :param file_ref: File reference
+        """
+        self.backend.delete_file(file_ref)
+
 # Example Usage
 if __name__ == "__main__":
     from io import BytesIO
@@ -1,8 +1,14 @@
 import os
+import logging
 import boto3
 from botocore.exceptions import BotoCoreError, ClientError
 from abc import ABC, abstractmethod
-from typing import Optional
+from typing import Iterable, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Chunk size used when streaming local files
+READ_CHUNK_SIZE = 1 << 20
 
 class StorageBackend(ABC):
     @abstractmethod
@@ -13,33 +19,103 @@ class StorageBackend(ABC):
     def read_file(self, file_ref: str) -> bytes:
         pass
 
+    @abstractmethod
+    def delete_file(self, file_ref: str) -> None:
+        pass
+
+    def save_many(self, files: Iterable[Tuple[str, bytes]]) -> None:
+        for file_ref, data in files:
+            self.save_file(file_ref, data)
+
+    def move_file(self, file_ref: str, new_file_ref: str) -> None:
+        self.save_file(new_file_ref, self.read_file(file_ref))
+        self.delete_file(file_ref)
+
+    def iter_file(self, file_ref: str, chunk_size: int = READ_CHUNK_SIZE) -> Iterator[bytes]:
+        yield self.read_file(file_ref)
+
 class LocalStorageBackend(StorageBackend):
     def __init__(self, base_directory: str):
         self.base_directory = base_directory
         os.makedirs(self.base_directory, exist_ok=True)
+        # Subdirectories that are known to exist, so each is only created once
+        self._created_dirs = set()
 
     def save_file(self, file_ref: str, data: bytes) -> None:
         full_path = os.path.join(self.base_directory, file_ref)
-        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        self._ensure_directory(file_ref)
         try:
-            with open(full_path, 'wb') as f:
-                f.write(data)
-            print(f"File saved locally at {full_path}")
+            # Raw fd writes skip the buffered-writer copy of the whole payload
+            fd = os.open(full_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+            try:
+                view = memoryview(data)
+                while view:
+                    view = view[os.write(fd, view):]
+            finally:
+                os.close(fd)
+            logger.debug("File saved locally at %s", full_path)
         except IOError as e:
-            print(f"Failed to save file locally: {e}")
+            logger.error("Failed to save file locally: %s", e)
             raise
 
     def read_file(self, file_ref: str) -> bytes:
         full_path = os.path.join(self.base_directory, file_ref)
         try:
-            with open(full_path, 'rb') as f:
+            with open(full_path, 'rb', buffering=0) as f:
+                self._advise_sequential(f.fileno())
                 data = f.read()
-            print(f"File read locally from {full_path}")
+            logger.debug("File read locally from %s", full_path)
             return data
         except IOError as e:
-            print(f"Failed to read file locally: {e}")
+            logger.error("Failed to read file locally: %s", e)
+            raise
+
+    def iter_file(self, file_ref: str, chunk_size: int = READ_CHUNK_SIZE) -> Iterator[bytes]:
+        """Streams a file in chunks instead of loading large audio/image files at once."""
+        full_path = os.path.join(self.base_directory, file_ref)
+        try:
+            with open(full_path, 'rb', buffering=0) as f:
+                self._advise_sequential(f.fileno())
+                while chunk := f.read(chunk_size):
+                    yield chunk
+        except IOError as e:
+            logger.error("Failed to read file locally: %s", e)
+            raise
+
+    def move_file(self, file_ref: str, new_file_ref: str) -> None:
+        full_path = os.path.join(self.base_directory, file_ref)
+        new_full_path = os.path.join(self.base_directory, new_file_ref)
+        self._ensure_directory(new_file_ref)
+        try:
+            os.replace(full_path, new_full_path)
+            logger.debug("File moved locally from %s to %s", full_path, new_full_path)
+        except IOError as e:
+            logger.error("Failed to move file locally: %s", e)
             raise
 
+    def delete_file(self, file_ref: str) -> None:
+        full_path = os.path.join(self.base_directory, file_ref)
+        try:
+            os.remove(full_path)
+            logger.debug("File deleted locally at %s", full_path)
+        except FileNotFoundError:
+            logger.debug("File to delete not found locally at %s", full_path)
+        except IOError as e:
+            logger.error("Failed to delete file locally: %s", e)
+            raise
+
+    def _ensure_directory(self, file_ref: str) -> None:
+        subdirectory = os.path.dirname(file_ref)
+        if subdirectory and subdirectory not in self._created_dirs:
+            os.makedirs(os.path.join(self.base_directory, subdirectory), exist_ok=True)
+            self._created_dirs.add(subdirectory)
+
+    @staticmethod
+    def _advise_sequential(fd: int) -> None:
+        # Hint the kernel to read ahead, only available on POSIX
+        if hasattr(os, "posix_fadvise"):
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+
 class S3StorageBackend(StorageBackend):
     def __init__(self, bucket_name: str, 
                  access_key_id: Optional[str] = None, 
@@ -58,36 +134,44 @@ class S3StorageBackend(StorageBackend):
             # Check if bucket exists, if not create it
             self._ensure_bucket_exists()
         except (BotoCoreError, ClientError) as e:
-            print(f"Failed to initialize AWS S3 client: {e}")
+            logger.error("Failed to initialize AWS S3 client: %s", e)
             raise
 
     def _ensure_bucket_exists(self):
         try:
             self.s3_client.head_bucket(Bucket=self.bucket_name)
-            print(f"Bucket '{self.bucket_name}' exists.")
+            logger.debug("Bucket '%s' exists.", self.bucket_name)
         except ClientError:
             # If bucket does not exist, create it
             try:
                 self.s3_client.create_bucket(Bucket=self.bucket_name)
-                print(f"Bucket '{self.bucket_name}' created.")
+                logger.info("Bucket '%s' created.", self.bucket_name)
             except (BotoCoreError, ClientError) as e:
-                print(f"Failed to create bucket '{self.bucket_name}': {e}")
+                logger.error("Failed to create bucket '%s': %s", self.bucket_name, e)
                 raise
 
     def save_file(self, file_ref: str, data: bytes) -> None:
         try:
             self.s3_client.put_object(Bucket=self.bucket_name, Key=file_ref, Body=data)
-            print(f"File saved to AWS S3 bucket '{self.bucket_name}' at '{file_ref}'")
+            logger.debug("File saved to AWS S3 bucket '%s' at '%s'", self.bucket_name, file_ref)
         except (BotoCoreError, ClientError) as e:
-            print(f"Failed to save file to AWS S3: {e}")
+            logger.error("Failed to save file to AWS S3: %s", e)
             raise
 
     def read_file(self, file_ref: str) -> bytes:
         try:
             response = self.s3_client.get_object(Bucket=self.bucket_name, Key=file_ref)
             data = response['Body'].read()
-            print(f"File read from AWS S3 bucket '{self.bucket_name}' at '{file_ref}'")
+            logger.debug("File read from AWS S3 bucket '%s' at '%s'", self.bucket_name, file_ref)
             return data
         except (BotoCoreError, ClientError) as e:
-            print(f"Failed to read file from AWS S3: {e}")
+            logger.error("Failed to read file from AWS S3: %s", e)
+            raise
+
+    def delete_file(self, file_ref: str) -> None:
+        try:
+            self.s3_client.delete_object(Bucket=self.bucket_name, Key=file_ref)
+            logger.debug("File deleted from AWS S3 bucket '%s' at '%s'", self.bucket_name, file_ref)
+        except (BotoCoreError, ClientError) as e:
+            logger.error("Failed to delete file from AWS S3: %s", e)
             raise
\ No newline at end of file
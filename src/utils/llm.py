@@ -1,17 +1,42 @@
 # llm.py
 
+import asyncio
+import base64
+import hashlib
+import inspect
 import logging
+import queue
+import random
 import time
+import httpx
 import numpy as np
 import litellm
-from typing import List, Optional, Tuple
-from threading import Lock
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple, Type, TypeVar
+from threading import Lock, Thread
 
 from src.utils.messages import Message  # Ensure this import is correct based on your project structure
 
+# Configure logging once on import, unless the application already did
+if not logging.getLogger().handlers:
+    logging.basicConfig(
+        level=logging.INFO,  # Default level; can be adjusted as needed
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
 # Disable verbose logging from litellm
 litellm.set_verbose = False
 
+# One pooled client for all litellm requests, so connections (and their TLS sessions)
+# are kept alive and reused across calls and LLM instances. A session the application
+# configured itself is left alone.
+if litellm.client_session is None:
+    litellm.client_session = httpx.Client(
+        timeout=httpx.Timeout(600.0, connect=10.0),
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=60.0),
+    )
+
 
 def remove_stop_sequences(content: str, stop_sequences: List[str]) -> str:
     """
@@ -24,142 +49,174 @@ def remove_stop_sequences(content: str, stop_sequences: List[str]) -> str:
     Returns:
         str: The content string with stop sequences removed from the end.
     """
+    # One C-level check for all sequences, usually the response ends with none of them
+    if not content or not stop_sequences or not content.endswith(tuple(stop_sequences)):
+        return content
     for stop_seq in stop_sequences:
-        if content and content.endswith(stop_seq):
+        if content and stop_seq and content.endswith(stop_seq):
             content = content[:-len(stop_seq)]
     return content
 
 
-class LLM:
+class RateLimiter:
+    """
+    Token bucket that admits `requests_per_minute` requests per minute on average and
+    bursts of up to as many. The lock only covers the bucket update, callers that have
+    to wait sleep without holding it.
+
+    The bucket is kept in integer units of 1/60e9 token, so with nanosecond timestamps
+    each elapsed nanosecond adds exactly `requests_per_minute` units and no float error
+    accumulates.
+    """
+
+    # Units per token, one minute in nanoseconds
+    TOKEN = 60_000_000_000
+
+    def __init__(self, requests_per_minute: int):
+        if requests_per_minute <= 0:
+            raise ValueError(
+                f"requests_per_minute must be positive, got {requests_per_minute}. Use None to disable rate limiting."
+            )
+        self.requests_per_minute = requests_per_minute
+        self.capacity = requests_per_minute * self.TOKEN
+        self.tokens = self.capacity
+        self.last_refill = time.monotonic_ns()
+        self._lock = Lock()
+        self.logger = logging.getLogger(__name__)
+
+    def acquire_slot(self):
+        """
+        Blocks until a request may be made and takes its token.
+        """
+        attempt = 0
+        while (wait := self._try_acquire()) > 0:
+            wait = self._backoff(wait, attempt)
+            self.logger.info(f"Rate limit reached. Sleeping for {wait:.2f} seconds.")
+            time.sleep(wait)
+            attempt += 1
+
+    async def acquire_slot_async(self):
+        """
+        Like `acquire_slot`, but waits without blocking the event loop.
+        """
+        attempt = 0
+        while (wait := self._try_acquire()) > 0:
+            wait = self._backoff(wait, attempt)
+            self.logger.info(f"Rate limit reached. Sleeping for {wait:.2f} seconds.")
+            await asyncio.sleep(wait)
+            attempt += 1
+
+    def _try_acquire(self) -> float:
+        """
+        Takes a token if one is available and returns 0, otherwise returns how many
+        seconds to wait for the next one.
+        """
+        with self._lock:
+            now = time.monotonic_ns()
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.last_refill) * self.requests_per_minute
+            )
+            self.last_refill = now
+            if self.tokens >= self.TOKEN:
+                self.tokens -= self.TOKEN
+                return 0.0
+            missing = self.TOKEN - self.tokens
+        # Ceiling division, the token is complete once the wait is over
+        return -(-missing // self.requests_per_minute) / 1e9
+
+    @staticmethod
+    def _backoff(wait: float, attempt: int) -> float:
+        """
+        Waiters that lost the race for a token add a little random delay to their next
+        wait, so they don't all wake up for the same next token again.
+        """
+        if attempt == 0:
+            return wait
+        return wait * random.uniform(1.0, 1.1)
+
+
+class BaseLLM:
     def __init__(
         self,
-        completion_model_id: str,
-        embedding_model_id: str,
-        completion_api_base: Optional[str] = None,
-        completion_api_key: Optional[str] = None,
-        embedding_api_base: Optional[str] = None,
-        embedding_api_key: Optional[str] = None,
-        completion_requests_per_minute: Optional[int] = None,  # Optional rate limit for completions
-        embedding_requests_per_minute: Optional[int] = None,   # Optional rate limit for embeddings
+        model_id: str,
+        api_base: Optional[str] = None,
+        api_key: Optional[str] = None,
+        requests_per_minute: Optional[int] = None,  # Optional rate limit
     ):
         """
-        Initializes the LLM.
+        Initializes the model connection shared by completion and embedding models.
 
         Args:
-            completion_model_id (str): The identifier for the LLM model used for completions.
-            embedding_model_id (str): The identifier for the LLM model used for embeddings.
-            completion_api_base (str, optional): The base URL for the completion API.
-            completion_api_key (str, optional): The API key for authentication (completions).
-            embedding_api_base (str, optional): The base URL for the embedding API.
-            embedding_api_key (str, optional): The API key for embedding model.
-            completion_requests_per_minute (int, optional): Max completion requests per minute.
-            embedding_requests_per_minute (int, optional): Max embedding requests per minute.
+            model_id (str): The identifier for the LLM model.
+            api_base (str, optional): The base URL for the API.
+            api_key (str, optional): The API key for authentication.
+            requests_per_minute (int, optional): Max requests per minute.
         """
-        if not completion_model_id:
-            raise ValueError("A completion_model_id must be provided.")
-        if not embedding_model_id:
-            raise ValueError("An embedding_model_id must be provided.")
+        if not model_id:
+            raise ValueError("A model_id must be provided.")
+
+        self.model_id = model_id
+        self.api_base = api_base
+        self.api_key = api_key
 
-        self.completion_model_id = completion_model_id
-        self.completion_api_base = completion_api_base
-        self.completion_api_key = completion_api_key
-
-        self.embedding_model_id = embedding_model_id
-        self.embedding_api_base = embedding_api_base
-        self.embedding_api_key = embedding_api_key
-
-        # Rate limiting parameters
-        self.completion_requests_per_minute = completion_requests_per_minute
-        self.embedding_requests_per_minute = embedding_requests_per_minute
-
-        # Initialize rate limiting only if limits are provided
-        if self.completion_requests_per_minute is not None:
-            self._completion_lock = Lock()
-            self._completion_window_start = time.time()
-            self._completion_request_count = 0
-        else:
-            self._completion_lock = None  # Indicate that rate limiting is disabled for completions
-
-        if self.embedding_requests_per_minute is not None:
-            self._embedding_lock = Lock()
-            self._embedding_window_start = time.time()
-            self._embedding_request_count = 0
-        else:
-            self._embedding_lock = None  # Indicate that rate limiting is disabled for embeddings
-
-        # Configure logging
-        logging.basicConfig(
-            level=logging.INFO,  # Default level; can be adjusted as needed
-            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+        # Initialize rate limiting only if a limit is provided, None disables it
+        self.requests_per_minute = requests_per_minute
+        self._rate_limiter = (
+            RateLimiter(requests_per_minute) if requests_per_minute is not None else None
         )
+
         self.logger = logging.getLogger(__name__)
 
-    def _check_rate_limit(
-        self,
-        lock: Lock,
-        window_start: float,
-        request_count: int,
-        max_requests: int
-    ) -> Tuple[float, int]:
+    def _acquire_rate_limit(self):
+        """
+        Acquires the rate limit slot for a request.
         """
-        Checks and updates the rate limit counters.
+        if self._rate_limiter is not None:
+            self._rate_limiter.acquire_slot()
 
-        Args:
-            lock (Lock): A threading lock to ensure thread safety.
-            window_start (float): The start time of the current window.
-            request_count (int): The number of requests made in the current window.
-            max_requests (int): The maximum number of allowed requests per window.
+    async def _acquire_rate_limit_async(self):
+        """
+        Acquires the rate limit slot for a request without blocking the event loop.
+        """
+        if self._rate_limiter is not None:
+            await self._rate_limiter.acquire_slot_async()
 
-        Returns:
-            Tuple[float, int]: Updated window_start and request_count.
-        """
-        with lock:
-            current_time = time.time()
-            elapsed = current_time - window_start
-
-            if elapsed >= 60:
-                # Reset the window
-                window_start = current_time
-                request_count = 1
-                self.logger.debug("Rate limit window reset.")
-            else:
-                if request_count < max_requests:
-                    request_count += 1
-                    self.logger.debug(f"Incremented request count: {request_count}/{max_requests}")
-                else:
-                    # Wait until the window resets
-                    sleep_time = 60 - elapsed
-                    self.logger.info(f"Rate limit reached. Sleeping for {sleep_time:.2f} seconds.")
-                    time.sleep(sleep_time)
-                    window_start = time.time()
-                    request_count = 1
-                    self.logger.debug("Rate limit window reset after sleep.")
-
-            return window_start, request_count
-
-    def _acquire_completion_rate_limit(self):
-        """
-        Acquires the rate limit slot for a completion request.
-        """
-        if self.completion_requests_per_minute is not None and self._completion_lock is not None:
-            self._completion_window_start, self._completion_request_count = self._check_rate_limit(
-                self._completion_lock,
-                self._completion_window_start,
-                self._completion_request_count,
-                self.completion_requests_per_minute
-            )
 
-    def _acquire_embedding_rate_limit(self):
+class CompletionLLM(BaseLLM):
+    def _completion_request(
+        self, messages: List[Message], stop_sequences: List[str], max_tokens: int
+    ) -> dict:
         """
-        Acquires the rate limit slot for an embedding request.
+        Builds the keyword arguments of a litellm completion request.
         """
-        if self.embedding_requests_per_minute is not None and self._embedding_lock is not None:
-            self._embedding_window_start, self._embedding_request_count = self._check_rate_limit(
-                self._embedding_lock,
-                self._embedding_window_start,
-                self._embedding_request_count,
-                self.embedding_requests_per_minute
-            )
+        if not isinstance(messages, list):
+            self.logger.warning("Messages should be a list of Message objects: %s", messages)
+            raise TypeError("Messages should be a list of Message objects")
+
+        # Convert custom Message objects to litellm's expected format
+        litellm_messages = [m.as_litellm() for m in messages]
+
+        self.logger.debug("LLM Input Messages: %s", litellm_messages)
+
+        return dict(
+            model=self.model_id,
+            messages=litellm_messages,
+            stop=stop_sequences,
+            max_tokens=max_tokens,
+            api_base=self.api_base,
+            api_key=self.api_key,
+        )
+
+    def _completion_content(self, response, stop_sequences: List[str]) -> str:
+        """
+        Extracts the generated text from a litellm completion response.
+        """
+        content = response.choices[0].message.content
+        content = remove_stop_sequences(content, stop_sequences)
+
+        self.logger.debug("LLM Output Content: %s", content)
+
+        return content
 
     def generate(
         self,
@@ -178,38 +235,59 @@ class LLM:
         Returns:
             str: The generated text content.
         """
-        if not isinstance(messages, list):
-            self.logger.warning("Messages should be a list of Message objects: %s", messages)
-            raise TypeError("Messages should be a list of Message objects")
-
         if stop_sequences is None:
             stop_sequences = []
 
-        # Convert custom Message objects to litellm's expected format
-        litellm_messages = [{"role": m.role, "content": m.content} for m in messages]
-
-        self.logger.debug(f"LLM Input Messages: {litellm_messages}")
+        request = self._completion_request(messages, stop_sequences, max_tokens)
 
         try:
             # Acquire rate limit before making the API call, if enabled
-            self._acquire_completion_rate_limit()
-
-            response = litellm.completion(
-                model=self.completion_model_id,
-                messages=litellm_messages,
-                stop=stop_sequences,
-                max_tokens=max_tokens,
-                api_base=self.completion_api_base,
-                api_key=self.completion_api_key,
-            )
+            self._acquire_rate_limit()
+
+            response = litellm.completion(**request)
 
             # Extract content from response
-            content = response.choices[0].message.content
-            content = remove_stop_sequences(content, stop_sequences)
+            return self._completion_content(response, stop_sequences)
+
+        except litellm.APIConnectionError as e:
+            # Quit the application if a connection error occurs
+            self.logger.warning(f"A litellm.APIConnectionError occurred: {e}")
+            raise SystemExit("Encountered an API connection error. Exiting the agent now.") from e
+
+        except Exception as e:
+            self.logger.warning(f"An error occurred generating model output: {e}")
+            raise
+
+    async def agenerate(
+        self,
+        messages: List[Message],
+        stop_sequences: Optional[List[str]] = None,
+        max_tokens: int = 1500,
+    ) -> str:
+        """
+        Async version of `generate`. Requests are network bound, so callers can run
+        many of them concurrently with `asyncio.gather`. Rate limit waits don't block
+        the event loop.
 
-            self.logger.debug(f"LLM Output Content: {content}")
+        Args:
+            messages (List[Message]): A list of Message objects containing roles and content.
+            stop_sequences (Optional[List[str]]): A list of stop sequences to terminate generation.
+            max_tokens (int): The maximum number of tokens to generate.
+
+        Returns:
+            str: The generated text content.
+        """
+        if stop_sequences is None:
+            stop_sequences = []
 
-            return content
+        request = self._completion_request(messages, stop_sequences, max_tokens)
+
+        try:
+            await self._acquire_rate_limit_async()
+
+            response = await litellm.acompletion(**request)
+
+            return self._completion_content(response, stop_sequences)
 
         except litellm.APIConnectionError as e:
             # Quit the application if a connection error occurs
@@ -220,29 +298,75 @@ class LLM:
             self.logger.warning(f"An error occurred generating model output: {e}")
             raise
 
-    def embed(self, text: str) -> np.ndarray:
+
+class EmbeddingLLM(BaseLLM):
+    def __init__(
+        self,
+        model_id: str,
+        api_base: Optional[str] = None,
+        api_key: Optional[str] = None,
+        requests_per_minute: Optional[int] = None,  # Optional rate limit
+        batch_size: int = 64,
+        flush_ms: float = 10.0,
+        cache_size: int = 10_000,
+        encoding_format: Optional[str] = None,
+    ):
+        """
+        Initializes the embedding model.
+
+        Args:
+            model_id (str): The identifier for the LLM model used for embeddings.
+            api_base (str, optional): The base URL for the embedding API.
+            api_key (str, optional): The API key for the embedding model.
+            requests_per_minute (int, optional): Max embedding requests per minute.
+            batch_size (int): Max number of concurrent `embed` calls sent as one request.
+            flush_ms (float): How long `embed` calls wait for others to join their request.
+            cache_size (int): How many embeddings to keep in memory, 0 disables the cache.
+            encoding_format (str, optional): Set to "base64" for providers that support it
+                (e.g. OpenAI compatible APIs), embeddings then arrive as packed floats instead of
+                JSON numbers and are decoded without parsing each float.
+        """
+        super().__init__(model_id, api_base, api_key, requests_per_minute)
+        self.encoding_format = encoding_format
+
+        # Concurrent `embed` calls are coalesced into batched requests by a background thread
+        self.batch_size = batch_size
+        self.flush_ms = flush_ms
+        self._embed_queue: "queue.Queue[Tuple[str, Future]]" = queue.Queue()
+        self._embed_worker: Optional[Thread] = None
+        self._embed_worker_lock = Lock()
+
+        # Least recently used embeddings, keyed by a hash of their text
+        self.cache_size = cache_size
+        self._embedding_cache: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._embedding_cache_lock = Lock()
+
+    def embed(self, text: str, normalize: bool = True) -> np.ndarray:
         """
         Generate an embedding for a given text.
 
+        Calls from several threads within `flush_ms` of each other share one batched
+        request, which also takes a single rate limit slot.
+
         Args:
             text (str): The text to embed.
+            normalize (bool): Whether to scale the embedding to unit L2 norm.
 
         Returns:
             np.ndarray: The embedding vector as a NumPy array.
         """
+        key = self._embedding_cache_key(text)
+        embedding = self._get_cached_embedding(key)
+        if embedding is not None:
+            return self._normalize(embedding) if normalize else embedding
+
+        future = Future()
+        self._embed_queue.put((text, future))
+        self._ensure_embed_worker()
         try:
-            # Acquire rate limit before making the API call, if enabled
-            self._acquire_embedding_rate_limit()
-
-            embedding_response = litellm.embedding(
-                model=self.embedding_model_id,
-                api_base=self.embedding_api_base,
-                api_key=self.embedding_api_key,
-                input=text,
-            )
-            embedding = embedding_response["data"][0]["embedding"]
-            self.logger.debug(f"Generated embedding for text: {text[:30]}...")  # Log first 30 chars
-            return np.array(embedding, dtype=np.float32)
+            embedding = self._cache_embedding(key, future.result())
+            self.logger.debug("Generated embedding for text: %.30s...", text)  # Log first 30 chars
+            return self._normalize(embedding) if normalize else embedding
 
         except litellm.APIConnectionError as e:
             # Quit the application if a connection error occurs
@@ -253,30 +377,243 @@ class LLM:
             self.logger.error(f"Error embedding text: {e}")
             raise
 
-    def embed_batch(self, batch: List[str]) -> np.ndarray:
+    def _ensure_embed_worker(self):
+        """
+        Starts the thread that batches `embed` calls, on first use.
+        """
+        if self._embed_worker is not None:
+            return
+        with self._embed_worker_lock:
+            if self._embed_worker is None:
+                self._embed_worker = Thread(target=self._embed_worker_loop, name="llm-embed", daemon=True)
+                self._embed_worker.start()
+
+    def _embed_worker_loop(self):
+        """
+        Collects queued texts for up to `flush_ms` (or `batch_size` texts), embeds them
+        in one request and resolves each caller's future.
+        """
+        while True:
+            pending = [self._embed_queue.get()]
+            deadline = time.monotonic() + self.flush_ms / 1000
+            while len(pending) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    pending.append(self._embed_queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+
+            try:
+                # Raises if the provider returned fewer (or more) rows than texts, so every
+                # caller gets an answer instead of waiting forever on an unresolved future
+                embeddings = self._embed_texts([text for text, _ in pending])
+            except Exception as e:
+                for _, future in pending:
+                    future.set_exception(e)
+                continue
+            for (_, future), embedding in zip(pending, embeddings):
+                future.set_result(embedding)
+
+    def _embed_texts(self, texts: List[str]) -> np.ndarray:
+        """
+        Embeds the texts with a single rate limited request.
+        """
+        # Acquire rate limit before making the API call, if enabled
+        self._acquire_rate_limit()
+
+        embedding_response = litellm.embedding(**self._embedding_request(texts))
+        return self._embedding_array(embedding_response["data"], len(texts))
+
+    def _embedding_request(self, texts: List[str]) -> dict:
+        """
+        Builds the keyword arguments of a litellm embedding request.
+        """
+        request = dict(
+            model=self.model_id,
+            api_base=self.api_base,
+            api_key=self.api_key,
+            input=texts,
+        )
+        if self.encoding_format is not None:
+            request["encoding_format"] = self.encoding_format
+        return request
+
+    def _embedding_array(self, data: list, expected: int) -> np.ndarray:
+        """
+        Converts the `data` entries of an embedding response into a 2D float32 array.
+        Raises ValueError if the response doesn't hold `expected` embeddings.
+        """
+        if len(data) != expected:
+            raise ValueError(f"Expected {expected} embeddings, the provider returned {len(data)}.")
+        if not data:
+            return np.empty((0, 0), dtype=np.float32)
+
+        # Fill the rows in place, NumPy converts each list in C without a list of lists in between
+        first = self._decode_embedding(data[0]["embedding"])
+        embeddings = np.empty((len(data), len(first)), dtype=np.float32)
+        embeddings[0] = first
+        for i in range(1, len(data)):
+            embeddings[i] = self._decode_embedding(data[i]["embedding"])
+        return embeddings
+
+    @staticmethod
+    def _embedding_cache_key(text: str) -> bytes:
+        # A fixed size digest, so the cache doesn't keep long texts alive
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+    def _get_cached_embedding(self, key: bytes) -> Optional[np.ndarray]:
+        with self._embedding_cache_lock:
+            embedding = self._embedding_cache.get(key)
+            if embedding is not None:
+                self._embedding_cache.move_to_end(key)
+            return embedding
+
+    def _cache_embedding(self, key: bytes, embedding: np.ndarray) -> np.ndarray:
+        """
+        Stores an embedding and returns the cached (read-only) array.
+        """
+        if self.cache_size <= 0:
+            return embedding
+        # Copy, so a row doesn't keep its whole batch alive, and freeze, since callers share it
+        embedding = np.array(embedding, dtype=np.float32)
+        embedding.flags.writeable = False
+        with self._embedding_cache_lock:
+            self._embedding_cache[key] = embedding
+            self._embedding_cache.move_to_end(key)
+            while len(self._embedding_cache) > self.cache_size:
+                self._embedding_cache.popitem(last=False)
+        return embedding
+
+    def _split_cached_embeddings(
+        self, batch: List[str]
+    ) -> Tuple[List[bytes], List[Optional[np.ndarray]], List[int]]:
+        """
+        Looks up every text of a batch. Returns the cache keys, the cached embeddings
+        (None where missing) and the indices of the texts that still have to be embedded.
+        """
+        keys = [self._embedding_cache_key(text) for text in batch]
+        cached = [self._get_cached_embedding(key) for key in keys]
+        missing = [i for i, embedding in enumerate(cached) if embedding is None]
+        return keys, cached, missing
+
+    def _merge_embeddings(
+        self,
+        keys: List[bytes],
+        cached: List[Optional[np.ndarray]],
+        missing: List[int],
+        new_embeddings: Optional[np.ndarray],
+        normalize: bool,
+    ) -> np.ndarray:
+        """
+        Caches the new embeddings and assembles the batch in its original order,
+        normalized in place if requested.
+        """
+        if not keys:
+            return np.empty((0, 0), dtype=np.float32)
+        if new_embeddings is not None:
+            for i, embedding in zip(missing, new_embeddings):
+                self._cache_embedding(keys[i], embedding)
+                cached[i] = embedding
+        embeddings = np.empty((len(cached), len(cached[0])), dtype=np.float32)
+        for i, embedding in enumerate(cached):
+            embeddings[i] = embedding
+        if normalize:
+            # In place on the array that was just filled, no second array for the result
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            np.divide(embeddings, norms, out=embeddings, where=norms != 0)
+        return embeddings
+
+    @staticmethod
+    def _normalize(embedding: np.ndarray) -> np.ndarray:
+        """
+        Returns the embedding scaled to unit L2 norm (unchanged if it is all zeros).
+        """
+        norm = np.linalg.norm(embedding)
+        return embedding / norm if norm != 0 else embedding.copy()
+
+    def clear_embedding_cache(self):
+        """
+        Forgets all cached embeddings.
+        """
+        with self._embedding_cache_lock:
+            self._embedding_cache.clear()
+
+    @staticmethod
+    def _decode_embedding(embedding):
+        """
+        Returns an embedding as given by the provider, or decoded if the provider sent
+        it base64 encoded (little-endian float32).
+        """
+        if isinstance(embedding, str):
+            return np.frombuffer(base64.b64decode(embedding), dtype="<f4")
+        return embedding
+
+    def embed_batch(self, batch: List[str], normalize: bool = True) -> np.ndarray:
         """
         Generate embeddings for a batch of texts.
 
         Args:
             batch (List[str]): A list of texts to embed.
+            normalize (bool): Whether to scale each embedding to unit L2 norm.
 
         Returns:
             np.ndarray: A 2D NumPy array where each row is an embedding vector.
         """
         try:
-            # Acquire rate limit before making the API call, if enabled
-            self._acquire_embedding_rate_limit()
+            keys, cached, missing = self._split_cached_embeddings(batch)
+            new_embeddings = self._embed_texts([batch[i] for i in missing]) if missing else None
+            embeddings = self._merge_embeddings(keys, cached, missing, new_embeddings, normalize)
+            self.logger.debug("Generated embeddings for batch of size: %d", len(batch))
+            return embeddings
 
-            embedding_response = litellm.embedding(
-                model=self.embedding_model_id,
-                api_base=self.embedding_api_base,
-                api_key=self.embedding_api_key,
-                input=batch,
-            )
-            data = embedding_response["data"]
-            embeddings = [entry["embedding"] for entry in data]
-            self.logger.debug(f"Generated embeddings for batch of size: {len(batch)}")
-            return np.array(embeddings, dtype=np.float32)
+        except litellm.APIConnectionError as e:
+            # Quit the application if a connection error occurs
+            self.logger.error(f"A litellm.APIConnectionError occurred: {e}")
+            raise SystemExit("Encountered an API connection error. Exiting the agent now.") from e
+
+        except Exception as e:
+            self.logger.error(f"Error embedding batch: {e}")
+            raise
+
+    async def aembed(self, text: str, normalize: bool = True) -> np.ndarray:
+        """
+        Async version of `embed`.
+
+        Args:
+            text (str): The text to embed.
+            normalize (bool): Whether to scale the embedding to unit L2 norm.
+
+        Returns:
+            np.ndarray: The embedding vector as a NumPy array.
+        """
+        return (await self.aembed_batch([text], normalize))[0]
+
+    async def aembed_batch(self, batch: List[str], normalize: bool = True) -> np.ndarray:
+        """
+        Async version of `embed_batch`.
+
+        Args:
+            batch (List[str]): A list of texts to embed.
+            normalize (bool): Whether to scale each embedding to unit L2 norm.
+
+        Returns:
+            np.ndarray: A 2D NumPy array where each row is an embedding vector.
+        """
+        try:
+            keys, cached, missing = self._split_cached_embeddings(batch)
+            new_embeddings = None
+            if missing:
+                await self._acquire_rate_limit_async()
+
+                embedding_response = await litellm.aembedding(
+                    **self._embedding_request([batch[i] for i in missing])
+                )
+                new_embeddings = self._embedding_array(embedding_response["data"], len(missing))
+            embeddings = self._merge_embeddings(keys, cached, missing, new_embeddings, normalize)
+            self.logger.debug("Generated embeddings for batch of size: %d", len(batch))
+            return embeddings
 
         except litellm.APIConnectionError as e:
             # Quit the application if a connection error occurs
@@ -285,4 +622,97 @@ class LLM:
 
         except Exception as e:
             self.logger.error(f"Error embedding batch: {e}")
-            raise
\ No newline at end of file
+            raise
+
+
+class LLM:
+    """
+    Deprecated, use `CompletionLLM` and `EmbeddingLLM` directly.
+
+    Pairs a completion and an embedding model behind the former single-class interface.
+    Methods are forwarded to the model that implements them, and the former prefixed
+    attributes map onto it (e.g. `embedding_batch_size` is `embedding.batch_size`).
+    """
+
+    def __init__(
+        self,
+        completion_model_id: str,
+        embedding_model_id: str,
+        completion_api_base: Optional[str] = None,
+        completion_api_key: Optional[str] = None,
+        embedding_api_base: Optional[str] = None,
+        embedding_api_key: Optional[str] = None,
+        completion_requests_per_minute: Optional[int] = None,
+        embedding_requests_per_minute: Optional[int] = None,
+        embedding_batch_size: int = 64,
+        embedding_flush_ms: float = 10.0,
+        embedding_cache_size: int = 10_000,
+        embedding_encoding_format: Optional[str] = None,
+    ):
+        if not completion_model_id:
+            raise ValueError("A completion_model_id must be provided.")
+        if not embedding_model_id:
+            raise ValueError("An embedding_model_id must be provided.")
+
+        self.completion = CompletionLLM(
+            completion_model_id,
+            api_base=completion_api_base,
+            api_key=completion_api_key,
+            requests_per_minute=completion_requests_per_minute,
+        )
+        self.embedding = EmbeddingLLM(
+            embedding_model_id,
+            api_base=embedding_api_base,
+            api_key=embedding_api_key,
+            requests_per_minute=embedding_requests_per_minute,
+            batch_size=embedding_batch_size,
+            flush_ms=embedding_flush_ms,
+            cache_size=embedding_cache_size,
+            encoding_format=embedding_encoding_format,
+        )
+
+    def __getattr__(self, name: str):
+        # Only called for names not found on the facade itself
+        if name in ("completion", "embedding"):
+            raise AttributeError(name)
+        for prefix in ("completion_", "embedding_"):
+            if name.startswith(prefix):
+                model = getattr(self, prefix[:-1])
+                if hasattr(model, name[len(prefix):]):
+                    return getattr(model, name[len(prefix):])
+        if hasattr(self.completion, name):
+            return getattr(self.completion, name)
+        return getattr(self.embedding, name)
+
+
+# Shared model instances by class and constructor arguments, see `get_llm`
+_llm_registry: Dict[tuple, object] = {}
+_llm_registry_lock = Lock()
+
+T = TypeVar("T")
+
+
+def get_llm(llm_class: Type[T], *args, **kwargs) -> T:
+    """
+    Returns the process-wide model of the given class for the given constructor
+    arguments, creating it on first use. Components configured with the same model and
+    key share one instance, and with it the rate limiter and, for embedding models, the
+    batching thread and the cache. Components that should each get their own requests
+    per minute budget must create their own instances instead. The shared instance must
+    not be reconfigured after construction.
+
+    Args:
+        llm_class (Type): `CompletionLLM` or `EmbeddingLLM` (or the deprecated `LLM`).
+        *args, **kwargs: The arguments of `llm_class.__init__`.
+
+    Returns:
+        The shared instance.
+    """
+    bound = inspect.signature(llm_class).bind(*args, **kwargs)
+    bound.apply_defaults()
+    key = (llm_class, *bound.arguments.items())
+    with _llm_registry_lock:
+        llm = _llm_registry.get(key)
+        if llm is None:
+            llm = _llm_registry[key] = llm_class(*bound.args, **bound.kwargs)
+        return llm
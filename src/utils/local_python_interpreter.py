@@ -3,16 +3,16 @@ import sys
 import io
 import types
 import inspect
-from typing import List, Optional
+import re
+import weakref
+from functools import lru_cache
+from typing import List, Optional, Tuple
 
 from src.utils.tool import Tool
 
 
 class ResultException(Exception):
-    """An internal exception used to capture result(value) calls."""
-
-    def __init__(self, value):
-        self.value = value
+    """An internal exception used to stop execution after result(value) calls, the value is kept by the interpreter."""
 
 
 class LogException(Exception):
@@ -22,6 +22,112 @@ class LogException(Exception):
         self.message = message
 
 
+class NullWriter(io.TextIOBase):
+    """A text stream that discards everything written to it. It can't be closed, since it is shared."""
+
+    def write(self, s: str) -> int:
+        return len(s)
+
+    def close(self):
+        # A snippet closing sys.stdout must not break output for later calls and other interpreters
+        pass
+
+
+# Snippet output isn't returned, so it goes to one shared sink instead of fresh buffers on every call
+_NULL_WRITER = NullWriter()
+
+
+# The fields of compound statements (and of except handlers and match cases) that hold nested statements
+_STATEMENT_FIELDS = ("body", "orelse", "finalbody", "handlers", "cases")
+
+
+def collect_imports(tree: ast.Module) -> frozenset:
+    """
+    Return the names of the modules imported by the parsed code, including imports nested in
+    function and class bodies or if/try/with blocks.
+    Only statement lists are scanned, expressions can't contain imports.
+    """
+    imported_modules = set()
+    statements = list(tree.body)
+    while statements:
+        node = statements.pop()
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                # e.g., "import math" -> alias.name = 'math'
+                imported_modules.add(alias.name)
+        elif isinstance(node, ast.ImportFrom):
+            # e.g., "from math import sqrt" -> node.module = 'math'
+            if node.module is not None:
+                imported_modules.add(node.module)
+        else:
+            for field in _STATEMENT_FIELDS:
+                statements.extend(getattr(node, field, ()))
+    return frozenset(imported_modules)
+
+
+# Built-in value types, an object of exactly one of these types is always a plain variable
+_VARIABLE_TYPES = frozenset(
+    {int, float, complex, bool, str, bytes, bytearray, list, tuple, dict, set, frozenset, type(None)}
+)
+
+# Import statements that start a line, e.g. "import a.b as c, d" or "from .e import f"
+_IMPORT_PATTERN = re.compile(r"^[ \t]*(?:import[ \t]+([\w.][\w., \t]*)|from[ \t]+([\w.]+)[ \t]+import\b)", re.M)
+
+# Any use of the "import" keyword, every one of them has to be matched by the pattern above
+_IMPORT_KEYWORD_PATTERN = re.compile(r"\bimport\b")
+
+# Source that a line-based scan could misread, multi-line strings and line continuations
+_IMPORT_PATTERN_PITFALLS = ('"""', "'''", "\\\n", "\\\r")
+
+
+def scan_imports(code: str) -> Optional[frozenset]:
+    """
+    Return the names of the modules imported by the code, found without parsing it.
+    Returns None if the code contains constructs the scan can't handle reliably.
+    """
+    if any(pitfall in code for pitfall in _IMPORT_PATTERN_PITFALLS):
+        return None
+    matches = _IMPORT_PATTERN.findall(code)
+    # Imports that don't start a line ("if x: import y", "x = 1; import y") and "import" in
+    # strings or comments, leave those to the parser
+    if len(matches) != len(_IMPORT_KEYWORD_PATTERN.findall(code)):
+        return None
+    imported_modules = set()
+    for names, module in matches:
+        if module:
+            # Like ast.ImportFrom.module, without the dots of relative imports ("from . import x" has none)
+            module = module.lstrip(".")
+            if module:
+                imported_modules.add(module)
+        else:
+            # e.g., "import a.b as c, d" -> 'a.b', 'd'
+            imported_modules.update(name.split()[0] for name in names.split(",") if name.strip())
+    return frozenset(imported_modules)
+
+
+# How many compiled snippets to keep, agents often run the same snippet again on retries
+CODE_CACHE_SIZE = 128
+
+
+@lru_cache(maxsize=CODE_CACHE_SIZE)
+def compile_snippet(code: str) -> Tuple[types.CodeType, frozenset]:
+    """
+    Parse and compile the code once and collect the modules it imports.
+    Code objects don't depend on the namespace they run in, so the cache is shared by all interpreters.
+    Raises SyntaxError if the code is invalid Python.
+
+    :return: The code object and the names of the imported modules.
+    """
+    # Compiling the source directly is faster than building the Python AST first, so the AST
+    # is only parsed when the imports can't be found by scanning the source.
+    # Same filename as exec() uses for source strings, so error messages don't change.
+    imported_modules = scan_imports(code)
+    if imported_modules is not None:
+        return compile(code, "<string>", "exec"), imported_modules
+    tree = ast.parse(code, filename="<string>")
+    return compile(tree, "<string>", "exec"), collect_imports(tree)
+
+
 class LocalPythonInterpreter:
     def __init__(self, tools: Optional[List[Tool]]=None):
         """
@@ -36,15 +142,26 @@ class LocalPythonInterpreter:
         # A set to keep track of imported modules (by name).
         self.imported_modules = set()
 
+        # Signature strings by function, a function's signature doesn't change once it is defined.
+        # Weak keys, so functions that were redefined or deleted in the namespace can be freed.
+        self._signatures: "weakref.WeakKeyDictionary[types.FunctionType, str]" = weakref.WeakKeyDictionary()
+
     def _initialize_globals(self):
         # Global namespace. We attach __builtins__ for normal Python usage.
         self._globals = {
             "__builtins__": __builtins__,
         }
 
-        # Provide a custom function `result(value)` that raises an internal exception to "return" a value.
+        # The last computed `state`, None once the namespace may have changed
+        self._state_cache = None
+
+        # Provide a custom function `result(value)` that stores the value and raises an internal
+        # exception to end the snippet.
+        self._result = None
+
         def result(value):
-            raise ResultException(value)
+            self._result = value
+            raise ResultException
 
         # Provide a custom function `log(message)` that appends messages to a log list.
         self._logs = []
@@ -61,59 +178,47 @@ class LocalPythonInterpreter:
             # e.g. if tool.name = "text_classifier", you can call it in Python as text_classifier(...)
             self._globals[tool.name] = tool
 
-    def _capture_imports(self, code: str):
+    def _compile(self, code: str) -> types.CodeType:
         """
-        Parse the code for import statements and record imported modules.
+        Compile the code (or take it from the cache), record its imported modules and return the code object.
         """
-        try:
-            tree = ast.parse(code)
-        except SyntaxError:
-            # If the code is invalid Python, we won't capture imports.
-            return
-
-        for node in ast.walk(tree):
-            if isinstance(node, ast.Import):
-                for alias in node.names:
-                    # e.g., "import math" -> alias.name = 'math'
-                    self.imported_modules.add(alias.name)
-            elif isinstance(node, ast.ImportFrom):
-                # e.g., "from math import sqrt" -> node.module = 'math'
-                if node.module is not None:
-                    self.imported_modules.add(node.module)
+        code_obj, imported_modules = compile_snippet(code)
+        self.imported_modules.update(imported_modules)
+        return code_obj
 
     def __call__(self, code: str):
         """
-        Execute the given code in our interpreter, capturing stdout and errors.
+        Execute the given code in our interpreter, discarding stdout and stderr and capturing errors.
         Returns (result, logs, error):
           - result: The value from `result(...)` if called, or None otherwise.
           - logs: A list of messages from `log(...)` calls.
           - error: Any error if an exception occurred, or None if no error.
         """
         old_stdout, old_stderr = sys.stdout, sys.stderr
-        stdout_buffer, stderr_buffer = io.StringIO(), io.StringIO()
-        sys.stdout, sys.stderr = stdout_buffer, stderr_buffer
+        sys.stdout = sys.stderr = _NULL_WRITER
 
-        result_value = None
-        logs = []
         error = None
+        self._result = None
 
-        # Clear previous logs
-        self._logs.clear()
-
-        # Capture imports in this code snippet
-        self._capture_imports(code)
+        # Code run in the namespace is the only way it changes
+        self._state_cache = None
 
         try:
-            exec(code, self._globals, self._globals)
-        except ResultException as re:
-            result_value = re.value
+            # Compile the snippet and capture its imports, invalid code ends up in `error`
+            exec(self._compile(code), self._globals)
+        except ResultException:
+            pass
         except Exception as e:
             error = str(e)
         finally:
-            # Capture logs after execution
-            logs = self._logs.copy()
+            # Hand out this call's log list and start a fresh one for the next call, instead of
+            # copying it. `log` looks up the current list on every call, so aliases that snippets
+            # kept (e.g. `logger = log`) never write to a list that was already returned.
+            logs, self._logs = self._logs, []
             sys.stdout, sys.stderr = old_stdout, old_stderr
 
+        # Don't keep the value alive until the next call
+        result_value, self._result = self._result, None
         return result_value, logs, error
 
     # -----------------------------------------
@@ -138,8 +243,10 @@ class LocalPythonInterpreter:
         Example: "sum(a, b) -> int" if type hints are present,
         or "sum(a, b)" if no type hints are available.
         """
-        sig = inspect.signature(func)
-        return f"{func.__name__}{sig}"
+        signature = self._signatures.get(func)
+        if signature is None:
+            signature = self._signatures[func] = f"{func.__name__}{inspect.signature(func)}"
+        return signature
 
     def _class_representation(self, cls: type) -> dict:
         """
@@ -163,6 +270,35 @@ class LocalPythonInterpreter:
 
         return class_dict
 
+    def _categorize(self) -> Tuple[dict, list, list, list]:
+        """
+        Sort the interpreter's namespace in a single pass.
+        Returns (variables, modules, functions, classes), where variables is a dict by name
+        and the others are lists of the module, function and class objects.
+        Hidden (dunder) items and our custom "result" and "log" functions are skipped.
+        """
+        variables, modules, functions, classes = {}, [], [], []
+        for k, v in self._globals.items():
+            # Skip Python internals and our custom "result" and "log" functions
+            if (k[:2] == "__" and k.endswith("__")) or k in {"result", "log"}:
+                continue
+            # One set lookup for the common case, instead of four failing isinstance() checks
+            if type(v) in _VARIABLE_TYPES:
+                variables[k] = v
+            elif isinstance(v, types.ModuleType):
+                modules.append(v)
+            # Functions (user-defined), built-in functions are treated like variables
+            elif isinstance(v, types.FunctionType):
+                functions.append(v)
+            elif isinstance(v, type):
+                classes.append(v)
+            # Tools are part of the environment, not state
+            elif isinstance(v, Tool):
+                continue
+            else:
+                variables[k] = v
+        return variables, modules, functions, classes
+
     # -----------------------------------------
     # PROPERTIES
     # -----------------------------------------
@@ -171,26 +307,7 @@ class LocalPythonInterpreter:
         """
         Return only normal variables (exclude modules, functions, classes, hidden items).
         """
-        filtered = {}
-        for k, v in self._globals.items():
-            # Skip Python internals and our custom "result" and "log" functions
-            if (k.startswith("__") and k.endswith("__")) or k in {"result", "log"}:
-                continue
-            # Exclude modules
-            if isinstance(v, types.ModuleType):
-                continue
-            # Exclude functions (including built-in or user-defined)
-            if isinstance(v, types.FunctionType):
-                continue
-            # Exclude classes
-            if isinstance(v, type):
-                continue
-            # Exclude tools
-            if isinstance(v, Tool):
-                continue
-            else:
-                filtered[k] = v
-        return filtered
+        return self._categorize()[0]
 
     @property
     def modules(self):
@@ -198,13 +315,7 @@ class LocalPythonInterpreter:
         Return a list of string representations of modules in the interpreter's namespace.
         e.g. ["'math' (built-in)", "'utils' (custom)", ... ]
         """
-        module_list = []
-        for k, v in self._globals.items():
-            if isinstance(v, types.ModuleType) and not (
-                k.startswith("__") and k.endswith("__")
-            ):
-                module_list.append(self._module_representation(v))
-        return module_list
+        return [self._module_representation(v) for v in self._categorize()[1]]
 
     @property
     def functions(self):
@@ -212,15 +323,7 @@ class LocalPythonInterpreter:
         Return a list of function signatures
         e.g. ["sum(a, b)", "sub(a, b)"]
         """
-        funcs = []
-        for k, v in self._globals.items():
-            if (
-                isinstance(v, types.FunctionType)
-                and k not in {"result", "log"}
-                and not (k.startswith("__") and k.endswith("__"))
-            ):
-                funcs.append(self._function_signature(v))
-        return funcs
+        return [self._function_signature(v) for v in self._categorize()[2]]
 
     @property
     def classes(self):
@@ -241,23 +344,23 @@ class LocalPythonInterpreter:
             }
         ]
         """
-        class_list = []
-        for k, v in self._globals.items():
-            if isinstance(v, type) and not (k.startswith("__") and k.endswith("__")):
-                class_list.append(self._class_representation(v))
-        return class_list
+        return [self._class_representation(v) for v in self._categorize()[3]]
 
     @property
     def state(self):
         """
         Return a JSON-serializable object reflecting the state of the local python interpreter.
+        It is computed again only after code was executed, callers must not modify it.
         """
-        return {
-            "modules": self.modules,
-            "functions": self.functions,
-            "classes": self.classes,
-            "variables": self.variables
-        }
+        if self._state_cache is None:
+            variables, modules, functions, classes = self._categorize()
+            self._state_cache = {
+                "modules": [self._module_representation(v) for v in modules],
+                "functions": [self._function_signature(v) for v in functions],
+                "classes": [self._class_representation(v) for v in classes],
+                "variables": variables
+            }
+        return self._state_cache
     # -----------------------------------------
 
     # METHODS
@@ -271,6 +374,7 @@ class LocalPythonInterpreter:
         """
         self._initialize_globals()
         self.imported_modules.clear()
+        self._signatures.clear()
 
 if __name__ == "__main__":
     interpreter = LocalPythonInterpreter()
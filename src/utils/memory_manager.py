@@ -1,11 +1,21 @@
+import asyncio
+import hashlib
+import json
 import sqlite3
 import logging
+import os
+import queue
+import threading
 import uuid
+from contextlib import contextmanager
+from concurrent.futures import Future, ThreadPoolExecutor
 from enum import Enum
 from pathlib import Path
-from typing import List, Any, Dict, Optional, Tuple, Union
+from typing import Callable, Iterator, List, Any, Dict, NamedTuple, Optional, Tuple, Union
 from io import BytesIO
 
+import hnswlib
+import numpy as np
 from PIL import Image
 
 from src.utils.file_storage import FileStorage
@@ -16,6 +26,9 @@ from src.utils.types import FileType
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# sqlite-vec reads FLOAT[] vectors as little-endian float32 BLOBs
+VECTOR_DTYPE = np.dtype("<f4")
+
 class MemoryOutputType(str, Enum):
     """
     Represents the type of memory to filter on when doing similarity searches.
@@ -28,12 +41,30 @@ class MemoryOutputType(str, Enum):
     IMAGE = "image"
     AUDIO = "audio"
 
+class Hit(NamedTuple):
+    """
+    A similarity search result, a memory joined with its file and the distance to the query.
+    `weighted_distance` is only set when the search was given output weights.
+    Use `_asdict()` where a dict is needed.
+    """
+
+    memory_id: int
+    timestamp: str
+    text: str
+    file_id: Optional[int]
+    file_type: Optional[str]
+    file_ref: Optional[str]
+    distance: float
+    weighted_distance: Optional[float] = None
+
 class MemoryManager:
     """
     A simple SQLite-based database class that stores:
       - Memories in a regular table (`memories`)
       - File metadata in a separate table (`files`)
       - Embeddings in a virtual sqlite-vec table (`memories_vec`).
+      - Int8 quantized copies of the embeddings in a second virtual table
+        (`memories_vec_i8`), used for the fast first pass of similarity searches.
 
     It requires `text` (text) for **all** memories (text, image, audio).
 
@@ -43,47 +74,147 @@ class MemoryManager:
       - Perform similarity (k-NN) searches using the sqlite-vec extension,
         with optional filtering by memory output type.
       - Use a single convenience method `select_similar` to automatically
-        detect whether the query is text, an image (PIL.Image.Image), or audio (BytesIO).
+        detect whether the query is text, an image (PIL.Image.Image or np.ndarray),
+        or audio (BytesIO).
+
+    All writes run on a dedicated writer thread that owns `conn`. Searches run on
+    pooled read-only connections, so in WAL mode they don't wait for writes.
     """
 
     def __init__(
         self,
         embedding_helper: EmbeddingHelper,
+        rerank_factor: int = 4,
+        ann_threshold: int = 10000,
+        optimize_interval: int = 1000,
+        index_save_interval: int = 1000,
     ):
         """
         :param embedding_helper: An instance of your EmbeddingHelper class (for text/image/audio).
+        :param rerank_factor:    How many int8 candidates to fetch per requested result
+                                 before re-ranking them by their exact float32 distance.
+        :param ann_threshold:    From how many stored embeddings on the candidates come from
+                                 the HNSW index instead of scanning `memories_vec_i8`.
+        :param optimize_interval: After how many inserted memories `PRAGMA optimize` runs.
+        :param index_save_interval: After how many added or deleted embeddings the HNSW
+                                 index is saved, besides on `close()`.
         """
         self.embedding_helper = embedding_helper
         self.vector_dim = embedding_helper.vector_dim
+        # Part of the embedding cache key, so switching models doesn't reuse stale vectors
+        self.embedding_model = getattr(
+            embedding_helper, "model_name", type(embedding_helper).__name__
+        )
+        self.rerank_factor = rerank_factor
+        self.ann_threshold = ann_threshold
+        self.optimize_interval = optimize_interval
+        self._inserts_since_optimize = 0
+        self.index_save_interval = index_save_interval
+        self._index_changes_since_save = 0
 
         # We'll place the DB in ~/.xeno/database.sqlite
         xeno_dir = Path.home() / ".xeno"
         xeno_dir.mkdir(parents=True, exist_ok=True)  # Ensure the folder exists
 
         self.db_file = xeno_dir / "memories.sqlite"
+        self.hnsw_index_file = xeno_dir / "memories.hnsw"
         self.memory_table_name = "memories"
         self.files_table_name = "memory_files"
         self.memory_vector_table_name = "memories_vec"
+        self.memory_vector_i8_table_name = "memories_vec_i8"
+        self.embedding_cache_table_name = "embedding_cache"
 
         self.conn = self._create_connection()
         self._create_tables()
+        self._prepare_statements()
+        self._backfill_quantized_embeddings()
+
+        # A single cursor for all writes
+        self._cursor = self.conn.cursor()
+
+        # Read-only connections, checked out per query and reused by any thread
+        self._reader_pool: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._reader_conns: List[sqlite3.Connection] = []
+        self._reader_conns_lock = threading.Lock()
 
-        # Local file storage
+        # Approximate nearest neighbour index, persisted next to the database.
+        # Searches and the writer thread share it, resizing is not safe during a query.
+        self._hnsw = self._load_hnsw_index()
+        self._hnsw_lock = threading.Lock()
+
+        # Local file storage, files are written in the background
         local_backend = LocalStorageBackend(base_directory=xeno_dir / "memory_files")
         self.local_storage = FileStorage(backend=local_backend)
+        self._io_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="memory-files")
+        self._pending_writes: Dict[str, Future] = {}
+        self._shard_file_refs()
+
+        # Embeddings of the async insert methods are computed here, off the event loop
+        self._embed_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="memory-embed")
+
+        # From here on `conn` is only used by the writer thread
+        self._write_queue: "queue.Queue[Optional[Tuple[Callable, tuple, Future]]]" = queue.Queue()
+        # Set by `close()` together with queueing the writer's stop signal, so nothing can be
+        # queued after it that the writer would never run
+        self._closed = False
+        self._write_queue_lock = threading.Lock()
+        self._close_lock = threading.Lock()
+        self._writer = threading.Thread(target=self._writer_loop, name="memory-writer", daemon=True)
+        self._writer.start()
+
+    def _writer_loop(self):
+        """
+        Runs the queued write operations one after the other until `close()` posts None.
+        """
+        while True:
+            item = self._write_queue.get()
+            if item is None:
+                return
+            fn, args, future = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(fn(*args))
+            except BaseException as e:
+                future.set_exception(e)
+
+    def _write(self, fn: Callable, *args) -> Any:
+        """
+        Runs `fn(*args)` on the writer thread and returns its result.
+        """
+        if threading.current_thread() is self._writer:
+            return fn(*args)
+        return self._post(fn, *args).result()
+
+    def _post(self, fn: Callable, *args) -> Future:
+        """
+        Queues `fn(*args)` for the writer thread without waiting for it.
+        Raises RuntimeError once the MemoryManager is closed.
+        """
+        future = Future()
+        with self._write_queue_lock:
+            if self._closed:
+                raise RuntimeError("MemoryManager is closed")
+            self._write_queue.put((fn, args, future))
+        return future
 
     def _create_connection(self) -> sqlite3.Connection:
         """
         Creates and returns a SQLite connection with the sqlite-vec extension loaded.
+        It is created here and then handed to the writer thread.
         """
         try:
-            conn = sqlite3.connect(self.db_file)
+            conn = self._connect(self.db_file)
             conn.row_factory = sqlite3.Row
-            conn.enable_load_extension(True)
-            import sqlite_vec  # Must be installed separately
 
-            sqlite_vec.load(conn)
-            conn.enable_load_extension(False)
+            # WAL lets similarity searches read while inserts commit, and with
+            # synchronous=NORMAL a commit no longer waits for an fsync.
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA cache_size=-65536")  # 64 MB
+            conn.execute("PRAGMA temp_store=MEMORY")
+            conn.execute("PRAGMA mmap_size=268435456")
+            conn.execute("PRAGMA wal_autocheckpoint=1000")
             logger.info(
                 "SQLite connection established and sqlite-vec extension loaded."
             )
@@ -92,12 +223,64 @@ class MemoryManager:
             logger.error(f"SQLite connection error: {e}")
             raise
 
+    @staticmethod
+    def _connect(database: str, uri: bool = False) -> sqlite3.Connection:
+        """
+        Opens a connection and loads the sqlite-vec extension into it. Extensions are
+        per connection in SQLite, so this is the only place that pays for loading it.
+        """
+        conn = sqlite3.connect(database, uri=uri, cached_statements=256, check_same_thread=False)
+        conn.enable_load_extension(True)
+        import sqlite_vec  # Must be installed separately
+
+        sqlite_vec.load(conn)
+        conn.enable_load_extension(False)
+        return conn
+
+    @contextmanager
+    def _reader(self) -> Iterator[sqlite3.Connection]:
+        """
+        Checks out a read-only connection from the pool, opening one only when all
+        pooled connections are busy. The pool never grows beyond the peak number of
+        concurrent searches, however many threads come and go.
+        Rows are plain tuples, which are much cheaper to build than sqlite3.Row.
+        Raises RuntimeError once the MemoryManager is closed.
+        """
+        if self._closed:
+            raise RuntimeError("MemoryManager is closed")
+        try:
+            conn = self._reader_pool.get_nowait()
+        except queue.Empty:
+            conn = self._create_reader_connection()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._reader_pool.put(conn)
+
+    def _create_reader_connection(self) -> sqlite3.Connection:
+        try:
+            conn = self._connect(f"file:{self.db_file}?mode=ro", uri=True)
+            conn.execute("PRAGMA cache_size=-65536")  # 64 MB
+            conn.execute("PRAGMA temp_store=MEMORY")
+            conn.execute("PRAGMA mmap_size=268435456")
+        except sqlite3.Error as e:
+            logger.error(f"SQLite reader connection error: {e}")
+            raise
+
+        with self._reader_conns_lock:
+            self._reader_conns.append(conn)
+        return conn
+
     def _create_tables(self):
         """
         Creates (if not exist):
           - `memories`
           - `files`
           - `memories_vec`
+          - `memories_vec_i8`
+          - a trigger that removes a deleted memory's embeddings and file row
 
         Ensures `text` is NOT NULL for `memories`.
         """
@@ -123,23 +306,396 @@ class MemoryManager:
             embedding FLOAT[{self.vector_dim}]
         );
         """
+        create_memories_vec_i8 = f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {self.memory_vector_i8_table_name}
+        USING vec0(
+            id INTEGER PRIMARY KEY,
+            embedding INT8[{self.vector_dim}] distance_metric=cosine
+        );
+        """
+        create_embedding_cache = f"""
+        CREATE TABLE IF NOT EXISTS {self.embedding_cache_table_name} (
+            kind TEXT NOT NULL,
+            hash BLOB NOT NULL,
+            embedding BLOB NOT NULL,
+            PRIMARY KEY (kind, hash)
+        ) WITHOUT ROWID;
+        """
+        create_memories_file_id_index = f"""
+        CREATE INDEX IF NOT EXISTS {self.memory_table_name}_file_id
+        ON {self.memory_table_name} (file_id);
+        """
+        create_memories_delete_trigger = f"""
+        CREATE TRIGGER IF NOT EXISTS {self.memory_table_name}_after_delete
+        AFTER DELETE ON {self.memory_table_name}
+        BEGIN
+            DELETE FROM {self.memory_vector_table_name} WHERE id = OLD.id;
+            DELETE FROM {self.memory_vector_i8_table_name} WHERE id = OLD.id;
+            DELETE FROM {self.files_table_name} WHERE id = OLD.file_id;
+        END;
+        """
         try:
             with self.conn:
                 self.conn.execute(create_memories)
                 self.conn.execute(create_files)
                 self.conn.execute(create_memories_vec)
+                self._drop_outdated_quantized_table()
+                self.conn.execute(create_memories_vec_i8)
+                self.conn.execute(create_memories_file_id_index)
+                self.conn.execute(create_embedding_cache)
+                self.conn.execute(create_memories_delete_trigger)
             logger.info(
                 f"Tables '{self.memory_table_name}', '{self.files_table_name}', "
-                f"and '{self.memory_vector_table_name}' created or verified."
+                f"'{self.memory_vector_table_name}' and '{self.memory_vector_i8_table_name}' "
+                f"created or verified."
             )
         except sqlite3.Error as e:
             logger.error(f"Error creating tables: {e}")
             raise
 
+    def _drop_outdated_quantized_table(self):
+        """
+        Drops a `memories_vec_i8` table created before it used the cosine metric. Its rows were
+        compared with L2 across differently scaled vectors, so the table is recreated and
+        `_backfill_quantized_embeddings` quantizes every embedding again.
+        """
+        row = self.conn.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?",
+            (self.memory_vector_i8_table_name,),
+        ).fetchone()
+        if row is not None and "distance_metric=cosine" not in row[0]:
+            self.conn.execute(f"DROP TABLE {self.memory_vector_i8_table_name}")
+            logger.info(f"Dropped outdated table '{self.memory_vector_i8_table_name}'.")
+
+    def _prepare_statements(self):
+        """
+        Builds every SQL statement once. sqlite3 caches prepared statements by
+        their SQL text, so reusing these strings skips rebuilding them per call.
+        """
+        self._sql_ins_file = f"""
+        INSERT INTO {self.files_table_name} (type, ref) VALUES (?, ?)
+        """
+        self._sql_ins_file_with_id = f"""
+        INSERT INTO {self.files_table_name} (id, type, ref) VALUES (?, ?, ?)
+        """
+        self._sql_ins_obs = f"""
+        INSERT INTO {self.memory_table_name} (text, file_id)
+        VALUES (?, ?)
+        """
+        self._sql_ins_obs_with_id = f"""
+        INSERT INTO {self.memory_table_name} (id, text, file_id)
+        VALUES (?, ?, ?)
+        """
+        self._sql_ins_vec = f"""
+        INSERT INTO {self.memory_vector_table_name} (id, embedding)
+        VALUES (?, ?)
+        """
+        self._sql_ins_vec_i8 = f"""
+        INSERT INTO {self.memory_vector_i8_table_name} (id, embedding)
+        VALUES (?, vec_int8(?))
+        """
+        self._sql_next_id = {
+            table_name: f"""
+            SELECT MAX(
+                COALESCE((SELECT seq FROM sqlite_sequence WHERE name = '{table_name}'), 0),
+                COALESCE((SELECT MAX(id) FROM {table_name}), 0)
+            ) + 1
+            """
+            for table_name in (self.files_table_name, self.memory_table_name)
+        }
+        # The delete trigger removes the embeddings and the file row, the file ref is
+        # read by RETURNING before the trigger runs.
+        self._sql_del_obs = f"""
+        DELETE FROM {self.memory_table_name} WHERE id = ?
+        RETURNING file_id, (SELECT ref FROM {self.files_table_name} WHERE id = file_id)
+        """
+        self._sql_sel_cached_embedding = f"""
+        SELECT embedding FROM {self.embedding_cache_table_name} WHERE kind = ? AND hash = ?
+        """
+        self._sql_ins_cached_embedding = f"""
+        INSERT OR REPLACE INTO {self.embedding_cache_table_name} (kind, hash, embedding)
+        VALUES (?, ?, ?)
+        """
+
+        # The similarity search is split around the optional output type filter.
+        # Both variants run the k-NN on its own and drive the joins and filters from
+        # the few candidate ids, so `memories_vec` is only read by id.
+        self._sql_sel_similar = f"""
+        WITH knn AS (
+            SELECT id FROM {self.memory_vector_i8_table_name}
+            WHERE embedding MATCH vec_int8(:query_i8)
+              AND k = :candidates
+        )
+        SELECT
+            o.id AS memory_id,
+            o.timestamp,
+            o.text,
+            f.id AS file_id,
+            f.type AS file_type,
+            f.ref AS file_ref,
+            vec_distance_l2(ov.embedding, :query) AS distance
+        FROM knn
+        JOIN {self.memory_vector_table_name} ov ON ov.id = knn.id
+        JOIN {self.memory_table_name} o
+        LEFT JOIN {self.files_table_name} f ON o.file_id = f.id
+        WHERE o.id = ov.id
+        """
+        self._sql_sel_similar_ann = f"""
+        WITH knn AS (
+            SELECT value AS id FROM json_each(:candidate_ids)
+        )
+        SELECT
+            o.id AS memory_id,
+            o.timestamp,
+            o.text,
+            f.id AS file_id,
+            f.type AS file_type,
+            f.ref AS file_ref,
+            vec_distance_l2(ov.embedding, :query) AS distance
+        FROM knn
+        JOIN {self.memory_vector_table_name} ov ON ov.id = knn.id
+        JOIN {self.memory_table_name} o
+        LEFT JOIN {self.files_table_name} f ON o.file_id = f.id
+        WHERE o.id = ov.id
+        """
+        self._sql_sel_similar_order = """
+        ORDER BY distance
+        LIMIT :top_k
+        """
+
+        # Specialize the search for all 2^3 output type combinations, keyed by the set
+        # of types. Each entry holds the int8 scan and the HNSW variant of the statement.
+        self._sql_sel_similar_variants: Dict[frozenset, Tuple[str, str]] = {}
+        for mask in range(1 << len(MemoryOutputType)):
+            output_types = [t for i, t in enumerate(MemoryOutputType) if mask & (1 << i)]
+            filter_sql = self._build_output_type_filter(output_types)
+            self._sql_sel_similar_variants[frozenset(output_types)] = (
+                self._sql_sel_similar + filter_sql + self._sql_sel_similar_order,
+                self._sql_sel_similar_ann + filter_sql + self._sql_sel_similar_order,
+            )
+
+    def _backfill_quantized_embeddings(self):
+        """
+        Adds int8 copies for embeddings that were stored before `memories_vec_i8` existed or
+        was recreated.
+        """
+        select_missing_sql = f"""
+        SELECT id, embedding FROM {self.memory_vector_table_name}
+        WHERE id NOT IN (SELECT id FROM {self.memory_vector_i8_table_name})
+        """
+        try:
+            rows = self.conn.execute(select_missing_sql).fetchall()
+            if not rows:
+                return
+            with self.conn:
+                self.conn.executemany(
+                    self._sql_ins_vec_i8,
+                    (
+                        (row[0], self._quantize_embedding(np.frombuffer(row[1], dtype=VECTOR_DTYPE)))
+                        for row in rows
+                    ),
+                )
+            logger.info(f"Backfilled {len(rows)} quantized embeddings.")
+        except sqlite3.Error as e:
+            logger.error(f"Error backfilling quantized embeddings: {e}")
+            raise
+
+    def _shard_file_refs(self):
+        """
+        Moves files stored before refs were sharded into their shard directories.
+        """
+        try:
+            rows = self.conn.execute(
+                f"SELECT id, ref FROM {self.files_table_name} WHERE instr(ref, '/') = 0"
+            ).fetchall()
+            if not rows:
+                return
+            updates = []
+            for file_id, file_ref in rows:
+                new_file_ref = self._shard_file_ref(file_ref)
+                try:
+                    self.local_storage.move_file(file_ref, new_file_ref)
+                except FileNotFoundError:
+                    logger.warning(f"File '{file_ref}' not found while sharding file refs.")
+                updates.append((new_file_ref, file_id))
+            with self.conn:
+                self.conn.executemany(
+                    f"UPDATE {self.files_table_name} SET ref = ? WHERE id = ?", updates
+                )
+            logger.info(f"Moved {len(updates)} files into shard directories.")
+        except sqlite3.Error as e:
+            logger.error(f"Error sharding file refs: {e}")
+            raise
+
+    def _load_hnsw_index(self) -> hnswlib.Index:
+        """
+        Loads the HNSW index from `hnsw_index_file` (or creates it) and brings it in
+        sync with `memories_vec`. The index is saved every `index_save_interval` changes
+        and on `close()`, so the embeddings changed since then are added or marked as
+        deleted here.
+        """
+        stored_ids = {
+            row[0] for row in self.conn.execute(f"SELECT id FROM {self.memory_vector_table_name}")
+        }
+        # Live elements, unlike get_current_count() this doesn't include deleted ones
+        self._hnsw_live_count = len(stored_ids)
+
+        index = hnswlib.Index(space="l2", dim=self.vector_dim)
+        max_elements = max(1024, 2 * len(stored_ids))
+        if self.hnsw_index_file.exists():
+            index.load_index(
+                str(self.hnsw_index_file), max_elements=max_elements, allow_replace_deleted=True
+            )
+            indexed_ids = set(index.get_ids_list())
+        else:
+            index.init_index(
+                max_elements=max_elements, ef_construction=200, M=16, allow_replace_deleted=True
+            )
+            indexed_ids = set()
+
+        for obs_id in indexed_ids - stored_ids:
+            try:
+                index.mark_deleted(obs_id)
+            except RuntimeError:
+                pass  # Already marked as deleted
+
+        missing_ids = stored_ids - indexed_ids
+        if missing_ids:
+            select_vec_sql = f"""
+            SELECT ov.id, ov.embedding
+            FROM json_each(?) AS missing
+            JOIN {self.memory_vector_table_name} ov ON ov.id = missing.value
+            """
+            rows = self.conn.execute(select_vec_sql, (json.dumps(sorted(missing_ids)),)).fetchall()
+            index.add_items(
+                np.stack([np.frombuffer(row[1], dtype=VECTOR_DTYPE) for row in rows]),
+                [row[0] for row in rows],
+                replace_deleted=True,
+            )
+            logger.info(f"Added {len(rows)} embeddings to the HNSW index.")
+
+        return index
+
+    def _index_embeddings(self, obs_ids: List[int], embeddings) -> None:
+        """
+        Adds embeddings to the HNSW index, growing it when it is full.
+        """
+        with self._hnsw_lock:
+            count = self._hnsw.get_current_count() + len(obs_ids)
+            if count > self._hnsw.get_max_elements():
+                self._hnsw.resize_index(max(count, 2 * self._hnsw.get_max_elements()))
+            self._hnsw.add_items(
+                np.asarray(embeddings, dtype=np.float32).reshape(len(obs_ids), self.vector_dim),
+                obs_ids,
+                replace_deleted=True,
+            )
+            self._hnsw_live_count += len(obs_ids)
+        self._count_index_changes(len(obs_ids))
+
+    def _count_index_changes(self, count: int):
+        """
+        Saves the HNSW index every `index_save_interval` added or deleted embeddings,
+        so a restart after an unclean exit only has to reconcile the recent changes.
+        Runs on the writer thread.
+        """
+        self._index_changes_since_save += count
+        if self._index_changes_since_save >= self.index_save_interval:
+            self._save_hnsw_index()
+
+    def _save_hnsw_index(self):
+        """
+        Writes the HNSW index to `hnsw_index_file`. It is written to a temporary file
+        first, so an interrupted save never leaves a truncated index behind.
+        """
+        self._index_changes_since_save = 0
+        tmp_file = self.hnsw_index_file.with_suffix(".hnsw.tmp")
+        try:
+            with self._hnsw_lock:
+                self._hnsw.save_index(str(tmp_file))
+            os.replace(tmp_file, self.hnsw_index_file)
+        except (OSError, RuntimeError) as e:
+            logger.error(f"Error saving HNSW index: {e}")
+
+    def checkpoint(self) -> threading.Thread:
+        """
+        Runs a `wal_checkpoint(TRUNCATE)` in a background thread on its own connection,
+        so the WAL is folded back into the database without blocking the caller.
+
+        :return: The started thread, join it to wait for the checkpoint.
+        """
+        thread = threading.Thread(target=self._run_checkpoint, name="memory-checkpoint", daemon=True)
+        thread.start()
+        return thread
+
+    def _run_checkpoint(self):
+        """
+        Checkpoints the WAL. Needs its own connection since `self.conn` belongs to the writer thread.
+        """
+        try:
+            conn = sqlite3.connect(self.db_file)
+            try:
+                busy, log_frames, checkpointed = conn.execute(
+                    "PRAGMA wal_checkpoint(TRUNCATE)"
+                ).fetchone()
+            finally:
+                conn.close()
+            logger.info(
+                f"WAL checkpoint done (busy={busy}, log={log_frames}, checkpointed={checkpointed})."
+            )
+        except sqlite3.Error as e:
+            logger.error(f"Error during WAL checkpoint: {e}")
+
+    def _optimize(self):
+        """
+        Lets SQLite refresh its query planner statistics where they are stale.
+        """
+        self._inserts_since_optimize = 0
+        try:
+            self.conn.execute("PRAGMA optimize")
+        except sqlite3.Error as e:
+            logger.error(f"Error optimizing database: {e}")
+
+    def _count_inserts(self, count: int):
+        """
+        Runs `PRAGMA optimize` every `optimize_interval` inserted memories.
+        """
+        self._inserts_since_optimize += count
+        if self._inserts_since_optimize >= self.optimize_interval:
+            self._optimize()
+
     def close(self):
         """
-        Closes the database connection.
+        Stops the writer thread, waits for pending file writes,
+        saves the HNSW index and closes the database connections.
+        Calling it again does nothing, other methods raise RuntimeError after it.
+        """
+        with self._close_lock:
+            if self._closed:
+                return
+            self._close()
+
+    def _close(self):
+        """
+        Runs `close()`, called at most once.
         """
+        self._embed_pool.shutdown(wait=True)
+        self._write(self._optimize)
+        with self._write_queue_lock:
+            self._closed = True
+            self._write_queue.put(None)
+        self._writer.join()
+        for file_ref in list(self._pending_writes):
+            try:
+                self._wait_for_write(file_ref)
+            except Exception:
+                pass  # Already logged by _on_write_done
+        self._io_pool.shutdown(wait=True)
+        if self._hnsw is not None:
+            self._save_hnsw_index()
+        with self._reader_conns_lock:
+            for conn in self._reader_conns:
+                conn.close()
+            self._reader_conns.clear()
         if self.conn:
             self.conn.close()
             logger.info("SQLite connection closed.")
@@ -156,25 +712,41 @@ class MemoryManager:
         """
         # Embed the text
         try:
-            embed_tensor = self.embedding_helper.create_text_embedding(text)
+            embedding = self._embed(MemoryOutputType.TEXT, text)
         except Exception as e:
             raise Exception(f"An error occurred while embedding the text: {str(e)}")
 
-        # Some embedding helpers return shape [D], others [1, D].
-        if len(embed_tensor.shape) == 2:
-            embedding = embed_tensor[0].tolist()
-        else:
-            embedding = embed_tensor.tolist()
-
-        # Insert into memories (file_id=None for text)
-        obs_id = self._insert_memory(text=text, file_id=None)
-
-        # Insert embedding
-        self._insert_embedding(obs_id, embedding)
+        obs_id, _ = self._write(self._write_memory, text, None, None, embedding)
 
         logger.info(f"Inserted text memory id={obs_id}, text='{text[:30]}'.")
         return obs_id
 
+    def insert_texts(self, texts: List[str]) -> List[int]:
+        """
+        Inserts several text memories at once:
+          1) Embeds all texts in a single batched forward pass
+          2) Stores the texts in `memories`
+          3) Stores the embeddings in `memories_vec`
+        All rows are written in one transaction.
+
+        :return: The memory ids, in the order of `texts`.
+        """
+        if not texts:
+            return []
+
+        # Embed all texts at once
+        try:
+            embeddings = self._to_vectors(self.embedding_helper.create_text_embeddings(texts))
+        except Exception as e:
+            raise Exception(f"An error occurred while embedding the texts: {str(e)}")
+
+        obs_ids = self.insert_batch(
+            [(text, None, None, embedding) for text, embedding in zip(texts, embeddings)]
+        )
+
+        logger.info(f"Inserted {len(obs_ids)} text memories.")
+        return obs_ids
+
     def insert_image(self, text: str, image: Image.Image) -> int:
         """
         Inserts an memory with an image (PIL Image). Also embeds the image internally.
@@ -182,34 +754,74 @@ class MemoryManager:
         :param text: A textual description or other required text for the memory.
         :param image:   A PIL.Image.Image object.
         """
+        # Encode the image for storage while it is being embedded. Decode a lazily loaded
+        # image first so the two threads don't both load it.
+        image.load()
+        encoded = self._io_pool.submit(self._encode_image, image)
+
         # Embed the image
         try:
-            embed_tensor = self.embedding_helper.create_image_embedding(image)
+            embedding = self._embed(MemoryOutputType.IMAGE, image)
         except Exception as e:
             raise Exception(f"An error occurred while embedding the image: {str(e)}")
 
-        # Some embedding helpers return shape [D], others [1, D].
-        if len(embed_tensor.shape) == 2:
-            embedding = embed_tensor[0].tolist()
-        else:
-            embedding = embed_tensor.tolist()
+        image_bytes = encoded.result()
 
-        # Convert the PIL image to bytes for storage.
-        img_buffer = BytesIO()
-        image.save(img_buffer, format="PNG")
-        image_bytes = img_buffer.getvalue()
+        obs_id, file_ref = self._write(self._write_memory, text, FileType.IMAGE, image_bytes, embedding)
 
-        # Store the file (type=IMAGE) -> get back file_id
-        file_id, file_ref = self._insert_file(FileType.IMAGE, image_bytes)
+        logger.info(f"Inserted image memory id={obs_id}, file_ref={file_ref}.")
+        return obs_id
 
-        # Insert the memory
-        obs_id = self._insert_memory(text=text, file_id=file_id)
+    def insert_images(
+        self, texts: List[str], images: List[Image.Image], batch_size: int = 8
+    ) -> List[int]:
+        """
+        Inserts several image memories. Images are embedded in batches of `batch_size`,
+        and the next batch is embedded in a background thread while the current one is
+        encoded and written to storage and the database.
+
+        :param texts:      The texts of the memories, one per image.
+        :param images:     The PIL.Image.Image objects.
+        :param batch_size: How many images to embed in one forward pass.
+        :return:           The memory ids, in the order of `images`.
+        """
+        if len(texts) != len(images):
+            raise ValueError(
+                f"Got {len(texts)} texts for {len(images)} images, expected one text per image."
+            )
 
-        # Insert embedding
-        self._insert_embedding(obs_id, embedding)
+        batches = [
+            (texts[i : i + batch_size], images[i : i + batch_size])
+            for i in range(0, len(images), batch_size)
+        ]
+        if not batches:
+            return []
 
-        logger.info(f"Inserted image memory id={obs_id}, file_ref={file_ref}.")
-        return obs_id
+        def embed(batch_images: List[Image.Image]) -> np.ndarray:
+            try:
+                return self._to_vectors(self.embedding_helper.create_image_embeddings(batch_images))
+            except Exception as e:
+                raise Exception(f"An error occurred while embedding the images: {str(e)}")
+
+        obs_ids = []
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            pending = executor.submit(embed, batches[0][1])
+            for i, (batch_texts, batch_images) in enumerate(batches):
+                embeddings = pending.result()
+                # Start embedding the next batch before writing this one
+                if i + 1 < len(batches):
+                    pending = executor.submit(embed, batches[i + 1][1])
+
+                records = [
+                    (text, FileType.IMAGE, image_bytes, embedding)
+                    for text, image_bytes, embedding in zip(
+                        batch_texts, self._io_pool.map(self._encode_image, batch_images), embeddings
+                    )
+                ]
+                obs_ids.extend(self.insert_batch(records))
+
+        logger.info(f"Inserted {len(obs_ids)} image memories.")
+        return obs_ids
 
     def insert_audio(self, text: str, audio: BytesIO) -> int:
         """
@@ -220,56 +832,385 @@ class MemoryManager:
         """
         # Embed the audio
         try:
-            embed_tensor = self.embedding_helper.create_audio_embedding(audio)
+            embedding = self._embed(MemoryOutputType.AUDIO, audio)
         except Exception as e:
             raise Exception(f"An error occurred while embedding audio: {str(e)}")
 
-        if len(embed_tensor.shape) == 2:
-            embedding = embed_tensor[0].tolist()
-        else:
-            embedding = embed_tensor.tolist()
-
         # Convert the BytesIO into raw bytes for storage.
         audio_bytes = audio.getvalue()
 
-        # Insert file (type=AUDIO)
-        file_id, file_ref = self._insert_file(FileType.AUDIO, audio_bytes)
+        obs_id, file_ref = self._write(self._write_memory, text, FileType.AUDIO, audio_bytes, embedding)
 
-        # Insert memory row
-        obs_id = self._insert_memory(text=text, file_id=file_id)
+        logger.info(f"Inserted audio memory id={obs_id}, file_ref={file_ref}.")
+        return obs_id
 
-        # Insert embedding
-        self._insert_embedding(obs_id, embedding)
+    def insert_audios(
+        self, texts: List[str], audios: List[BytesIO], batch_size: int = 8
+    ) -> List[int]:
+        """
+        Inserts several audio memories. Clips are embedded in batches of `batch_size`,
+        then all memories are written in a single transaction.
+
+        :param texts:      The texts of the memories, one per audio clip.
+        :param audios:     BytesIO objects containing raw audio data (e.g., WAV).
+        :param batch_size: How many clips to embed in one forward pass. Clips in a batch
+                           are zero-padded to the longest one.
+        :return:           The memory ids, in the order of `audios`.
+        """
+        if len(texts) != len(audios):
+            raise ValueError(
+                f"Got {len(texts)} texts for {len(audios)} audio clips, expected one text per clip."
+            )
 
-        logger.info(f"Inserted audio memory id={obs_id}, file_ref={file_ref}.")
+        records = []
+        for i in range(0, len(audios), batch_size):
+            batch_texts = texts[i : i + batch_size]
+            batch_audios = audios[i : i + batch_size]
+            try:
+                embeddings = self._to_vectors(
+                    self.embedding_helper.create_audio_embeddings(batch_audios)
+                )
+            except Exception as e:
+                raise Exception(f"An error occurred while embedding audio: {str(e)}")
+            records.extend(
+                (text, FileType.AUDIO, audio.getvalue(), embedding)
+                for text, audio, embedding in zip(batch_texts, batch_audios, embeddings)
+            )
+
+        obs_ids = self.insert_batch(records)
+
+        logger.info(f"Inserted {len(obs_ids)} audio memories.")
+        return obs_ids
+
+    def insert_batch(
+        self,
+        records: List[Tuple[str, Optional[FileType], Optional[bytes], np.ndarray]],
+    ) -> List[int]:
+        """
+        Inserts already embedded memories in a single transaction, using one
+        `executemany` per table.
+
+        :param records: (text, file_type, file_data, embedding) tuples. Use None for
+                        file_type and file_data for text-only memories.
+        :return:        The memory ids, in the order of `records`.
+        """
+        if not records:
+            return []
+
+        records = [
+            (text, file_type, data, self._check_embedding(embedding))
+            for text, file_type, data, embedding in records
+        ]
+
+        # Start saving the files, the rows only reference them
+        file_rows = []
+        for _, file_type, data, _ in records:
+            if file_type is None:
+                file_rows.append(None)
+                continue
+            file_ref = self._new_file_ref(file_type)
+            self._save_file(file_ref, data)
+            file_rows.append((file_type.value, file_ref))
+
+        return self._write(self._write_batch, records, file_rows)
+
+    #
+    # Async Insert Methods
+    #
+    async def insert_text_async(self, text: str) -> int:
+        """
+        Like `insert_text`, but awaits the embedding and the write instead of blocking
+        the event loop. Concurrent calls embed the next memory while the writer thread
+        commits the previous one.
+        """
+        return await self._insert_async(MemoryOutputType.TEXT, text, text)
+
+    async def insert_image_async(self, text: str, image: Image.Image) -> int:
+        """
+        Like `insert_image`, but awaits the embedding and the write instead of blocking
+        the event loop.
+        """
+        return await self._insert_async(MemoryOutputType.IMAGE, text, image)
+
+    async def insert_audio_async(self, text: str, audio: BytesIO) -> int:
+        """
+        Like `insert_audio`, but awaits the embedding and the write instead of blocking
+        the event loop.
+        """
+        return await self._insert_async(MemoryOutputType.AUDIO, text, audio)
+
+    async def _insert_async(
+        self, kind: MemoryOutputType, text: str, data: Union[str, Image.Image, BytesIO]
+    ) -> int:
+        """
+        Embeds `data` on the embedding pool and hands the memory to the writer thread.
+        """
+        file_type = encoded = None
+        if kind == MemoryOutputType.IMAGE:
+            file_type = FileType.IMAGE
+            # Decoded up front so encoding and embedding don't both load a lazy image
+            data.load()
+            encoded = asyncio.wrap_future(self._io_pool.submit(self._encode_image, data))
+        elif kind == MemoryOutputType.AUDIO:
+            file_type = FileType.AUDIO
+
+        loop = asyncio.get_running_loop()
+        try:
+            embedding = await loop.run_in_executor(self._embed_pool, self._embed, kind, data)
+        except Exception as e:
+            raise Exception(f"An error occurred while embedding the {kind.value}: {str(e)}")
+
+        if kind == MemoryOutputType.IMAGE:
+            file_data = await encoded
+        elif kind == MemoryOutputType.AUDIO:
+            file_data = data.getvalue()
+        else:
+            file_data = None
+
+        obs_id, file_ref = await asyncio.wrap_future(
+            self._post(self._write_memory, text, file_type, file_data, embedding)
+        )
+
+        logger.info(f"Inserted {kind.value} memory id={obs_id}, file_ref={file_ref}.")
         return obs_id
 
+    #
+    # Writer Thread Operations
+    #
+    def _write_memory(
+        self,
+        text: str,
+        file_type: Optional[FileType],
+        data: Optional[bytes],
+        embedding: np.ndarray,
+    ) -> Tuple[int, Optional[str]]:
+        """
+        Inserts one memory with its optional file and its embedding in one transaction.
+        Runs on the writer thread. Returns: (obs_id, file_ref)
+        """
+        file_id = file_ref = None
+        with self.conn:
+            if file_type is not None:
+                # Store the file -> get back file_id
+                file_id, file_ref = self._insert_file(file_type, data)
+
+            # Insert the memory
+            obs_id = self._insert_memory(text=text, file_id=file_id)
+
+            # Insert embedding
+            self._insert_embedding(obs_id, embedding)
+
+        self._count_inserts(1)
+        return obs_id, file_ref
+
+    def _write_batch(
+        self,
+        records: List[Tuple[str, Optional[FileType], Optional[bytes], np.ndarray]],
+        file_rows: List[Optional[Tuple[str, str]]],
+    ) -> List[int]:
+        """
+        Writes the rows of `insert_batch` with one `executemany` per table.
+        Runs on the writer thread.
+        """
+        cursor = self._cursor
+        try:
+            with self.conn:
+                # Take the write lock up front so the ids reserved below stay free
+                cursor.execute("BEGIN IMMEDIATE")
+
+                file_count = sum(row is not None for row in file_rows)
+                next_file_id = self._next_id(self.files_table_name)
+                next_obs_id = self._next_id(self.memory_table_name)
+
+                file_ids = []
+                for row in file_rows:
+                    if row is None:
+                        file_ids.append(None)
+                    else:
+                        file_ids.append(next_file_id)
+                        next_file_id += 1
+                obs_ids = list(range(next_obs_id, next_obs_id + len(records)))
+
+                if file_count:
+                    cursor.executemany(
+                        self._sql_ins_file_with_id,
+                        (
+                            (file_id, *row)
+                            for file_id, row in zip(file_ids, file_rows)
+                            if row is not None
+                        ),
+                    )
+                cursor.executemany(
+                    self._sql_ins_obs_with_id,
+                    (
+                        (obs_id, text, file_id)
+                        for obs_id, (text, _, _, _), file_id in zip(obs_ids, records, file_ids)
+                    ),
+                )
+                cursor.executemany(
+                    self._sql_ins_vec,
+                    (
+                        (obs_id, self._serialize_embedding(embedding))
+                        for obs_id, (_, _, _, embedding) in zip(obs_ids, records)
+                    ),
+                )
+                cursor.executemany(
+                    self._sql_ins_vec_i8,
+                    (
+                        (obs_id, self._quantize_embedding(embedding))
+                        for obs_id, (_, _, _, embedding) in zip(obs_ids, records)
+                    ),
+                )
+        except sqlite3.Error as e:
+            logger.error(f"Error inserting memory batch: {e}")
+            raise
+
+        self._index_embeddings(obs_ids, [embedding for _, _, _, embedding in records])
+        self._count_inserts(len(obs_ids))
+        return obs_ids
+
     #
     # Internal Helpers
     #
-    def _insert_file(self, file_type: FileType, data: bytes) -> Tuple[int, str]:
+    def _embed(
+        self,
+        kind: MemoryOutputType,
+        data: Union[str, Image.Image, np.ndarray, BytesIO],
+        cache: bool = True,
+    ) -> np.ndarray:
         """
-        Saves file data locally and inserts into the `files` table.
-        Returns: (file_id, file_ref)
+        Embeds text, an image (PIL or uint8 RGB array) or audio (BytesIO) into a float32
+        vector. Embeddings are cached in `embedding_cache` by kind, embedding model and a
+        hash of the content.
+
+        :param cache: Whether to store a newly computed embedding. Queries pass False so that
+                      searching only reads the cache and it grows with the stored memories.
+        """
+        if kind == MemoryOutputType.TEXT:
+            content = data.encode("utf-8")
+        elif isinstance(data, np.ndarray):
+            data = np.ascontiguousarray(data, dtype=np.uint8)
+            # Hashed like the equivalent RGB PIL image, so both hit the same cache entry
+            content = f"RGB{(data.shape[1], data.shape[0])}".encode() + data.tobytes()
+        elif kind == MemoryOutputType.IMAGE:
+            content = f"{data.mode}{data.size}".encode() + data.tobytes()
+        else:
+            content = data.getvalue()
+        key = (
+            f"{kind.value}:{self.embedding_model}",
+            hashlib.blake2b(content, digest_size=16).digest(),
+        )
+
+        with self._reader() as conn:
+            row = conn.execute(self._sql_sel_cached_embedding, key).fetchone()
+        if row is not None:
+            return np.frombuffer(row[0], dtype=VECTOR_DTYPE)
+
+        if kind == MemoryOutputType.TEXT:
+            embed_tensor = self.embedding_helper.create_text_embedding(data)
+        elif isinstance(data, np.ndarray):
+            embed_tensor = self.embedding_helper.create_image_embedding_from_array(data)
+        elif kind == MemoryOutputType.IMAGE:
+            embed_tensor = self.embedding_helper.create_image_embedding(data)
+        else:
+            embed_tensor = self.embedding_helper.create_audio_embedding(data)
+
+        # Some embedding helpers return shape [D], others [1, D].
+        embedding = self._to_vector(embed_tensor)
+
+        if cache:
+            # Nobody waits for the cache entry, it is written whenever the writer gets to it
+            self._post(self._cache_embedding, *key, self._serialize_embedding(embedding))
+        return embedding
+
+    def _cache_embedding(self, kind: str, content_hash: bytes, embedding_blob: bytes):
+        """
+        Stores an embedding in `embedding_cache`. Runs on the writer thread.
+        """
+        try:
+            with self.conn:
+                self._cursor.execute(
+                    self._sql_ins_cached_embedding, (kind, content_hash, embedding_blob)
+                )
+        except sqlite3.Error as e:
+            logger.error(f"Error caching embedding: {e}")
+
+    def _next_id(self, table_name: str) -> int:
+        """
+        Returns the id the next row inserted into an AUTOINCREMENT table would get.
+        Only stable while holding the write lock.
+        """
+        return self._cursor.execute(self._sql_next_id[table_name]).fetchone()[0]
+
+    @staticmethod
+    def _encode_image(image: Image.Image) -> bytes:
+        """
+        Encodes an image as PNG for storage. The embedding never reads these bytes back,
+        so a low compression level is used, which is several times faster than the default.
+        """
+        img_buffer = BytesIO()
+        image.save(img_buffer, format="PNG", compress_level=1)
+        return img_buffer.getvalue()
+
+    @staticmethod
+    def _new_file_ref(file_type: FileType) -> str:
+        """
+        Returns a new unique file reference with an extension matching the file type.
         """
         extension_map = {
             FileType.IMAGE: "png",
             FileType.AUDIO: "wav",
         }
         extension = extension_map.get(file_type, "bin")
-        file_ref = f"{uuid.uuid4()}.{extension}"
+        return MemoryManager._shard_file_ref(f"{uuid.uuid4().hex}.{extension}")
+
+    @staticmethod
+    def _shard_file_ref(file_name: str) -> str:
+        """
+        Spreads files over two levels of directories named after the first four
+        characters of their name (ab/cd/abcd....png), so no directory gets too big.
+        """
+        return f"{file_name[:2]}/{file_name[2:4]}/{file_name}"
+
+    def _save_file(self, file_ref: str, data: bytes):
+        """
+        Saves file data to local storage on the I/O pool, without waiting for the write.
+        """
+        future = self._io_pool.submit(self.local_storage.save_file, file_ref, data)
+        self._pending_writes[file_ref] = future
+        future.add_done_callback(lambda f: self._on_write_done(file_ref, f))
+
+    def _on_write_done(self, file_ref: str, future: Future):
+        """
+        Logs failed writes. Successful writes are no longer tracked.
+        """
+        if future.exception() is not None:
+            logger.error(f"Error saving file '{file_ref}': {future.exception()}")
+        else:
+            self._pending_writes.pop(file_ref, None)
+
+    def _wait_for_write(self, file_ref: str):
+        """
+        Blocks until a pending write of `file_ref` has finished, re-raising its error.
+        """
+        future = self._pending_writes.pop(file_ref, None)
+        if future is not None:
+            future.result()
+
+    def _insert_file(self, file_type: FileType, data: bytes) -> Tuple[int, str]:
+        """
+        Saves file data locally (in the background) and inserts into the `files` table.
+        Does not commit, callers wrap it in a transaction.
+        Returns: (file_id, file_ref)
+        """
+        file_ref = self._new_file_ref(file_type)
 
         # Save the file to local storage
-        self.local_storage.save_file(file_ref, data)
+        self._save_file(file_ref, data)
 
         # Insert into files table
-        insert_file_sql = f"""
-        INSERT INTO {self.files_table_name} (type, ref) VALUES (?, ?)
-        """
         try:
-            with self.conn:
-                cursor = self.conn.execute(insert_file_sql, (file_type.value, file_ref))
-                file_id = cursor.lastrowid
+            file_id = self._cursor.execute(self._sql_ins_file, (file_type.value, file_ref)).lastrowid
         except sqlite3.Error as e:
             logger.error(f"Error inserting into files table: {e}")
             raise
@@ -279,40 +1220,80 @@ class MemoryManager:
     def _insert_memory(self, text: str, file_id: Optional[int]) -> int:
         """
         Inserts into `memories` table. `text` must not be None.
-        """
-        insert_obs_sql = f"""
-        INSERT INTO {self.memory_table_name} (text, file_id)
-        VALUES (?, ?)
+        Does not commit, callers wrap it in a transaction.
         """
         try:
-            with self.conn:
-                cursor = self.conn.execute(insert_obs_sql, (text, file_id))
-                obs_id = cursor.lastrowid
+            obs_id = self._cursor.execute(self._sql_ins_obs, (text, file_id)).lastrowid
         except sqlite3.Error as e:
             logger.error(f"Error inserting memory: {e}")
             raise
         return obs_id
 
-    def _insert_embedding(self, obs_id: int, embedding: List[float]):
+    def _check_embedding(self, embedding: np.ndarray, name: str = "Embedding") -> np.ndarray:
         """
-        Inserts the embedding into memories_vec. Ensures dimension matches.
+        Returns the embedding as a contiguous little-endian float32 array of shape (vector_dim,),
+        which is a no-op for the arrays `_to_vector` produces. Raises ValueError on a wrong shape.
         """
-        if len(embedding) != self.vector_dim:
+        embedding = np.ascontiguousarray(embedding, dtype=VECTOR_DTYPE)
+        if embedding.shape != (self.vector_dim,):
             raise ValueError(
-                f"Embedding length ({len(embedding)}) != vector_dim ({self.vector_dim})."
+                f"{name} shape {embedding.shape} != ({self.vector_dim},)."
             )
-        embedding_str = "[" + ", ".join(str(x) for x in embedding) + "]"
-        insert_vec_sql = f"""
-        INSERT INTO {self.memory_vector_table_name} (id, embedding)
-        VALUES (?, ?)
+        return embedding
+
+    @staticmethod
+    def _to_vector(embed_tensor) -> np.ndarray:
+        """
+        Converts an embedding tensor of shape [D] or [1, D] into a float32 numpy vector of shape [D].
+        """
+        if embed_tensor.ndim == 2:
+            embed_tensor = embed_tensor[0]
+        return np.ascontiguousarray(embed_tensor.detach().cpu().numpy(), dtype=VECTOR_DTYPE)
+
+    @staticmethod
+    def _to_vectors(embed_tensor) -> np.ndarray:
+        """
+        Converts a batch of embeddings of shape [B, D] into a float32 numpy array.
         """
+        return np.ascontiguousarray(embed_tensor.detach().cpu().numpy(), dtype=VECTOR_DTYPE)
+
+    @staticmethod
+    def _serialize_embedding(embedding: np.ndarray) -> bytes:
+        """
+        Serializes a vector into the raw little-endian float32 BLOB format sqlite-vec reads directly.
+        """
+        return np.asarray(embedding, dtype=VECTOR_DTYPE).tobytes()
+
+    @staticmethod
+    def _quantize_embedding(embedding: np.ndarray) -> bytes:
+        """
+        Quantizes a vector to int8 by scaling its largest component to 127 and serializes it.
+        The scale is dropped, which `memories_vec_i8` tolerates because it compares by cosine
+        distance. The int8 vectors only pick candidates, which are re-ranked with their float32
+        embeddings.
+        """
+        embedding = np.asarray(embedding, dtype=np.float32)
+        scale = float(np.abs(embedding).max())
+        if scale == 0.0:
+            return np.zeros(embedding.shape, dtype=np.int8).tobytes()
+        return np.round(embedding * (127.0 / scale)).astype(np.int8).tobytes()
+
+    def _insert_embedding(self, obs_id: int, embedding: np.ndarray):
+        """
+        Inserts the embedding into memories_vec and its int8 copy into memories_vec_i8.
+        Ensures dimension matches. Does not commit, callers wrap it in the transaction
+        of its memory row, so a memory is never stored without its embedding.
+        """
+        embedding = self._check_embedding(embedding)
         try:
-            with self.conn:
-                self.conn.execute(insert_vec_sql, (obs_id, embedding_str))
+            self._cursor.execute(self._sql_ins_vec, (obs_id, self._serialize_embedding(embedding)))
+            self._cursor.execute(self._sql_ins_vec_i8, (obs_id, self._quantize_embedding(embedding)))
         except sqlite3.Error as e:
             logger.error(f"Error inserting embedding for obs_id={obs_id}: {e}")
             raise
 
+        self._index_embeddings([obs_id], [embedding])
+
     #
     # Delete
     #
@@ -321,54 +1302,45 @@ class MemoryManager:
         Deletes the memory by ID (including embedding).
         Also deletes any associated file in the DB and from local storage.
         """
-        # 1) Find if there's an associated file
-        select_file_sql = f"""
-        SELECT o.file_id, f.ref
-        FROM {self.memory_table_name} o
-        LEFT JOIN {self.files_table_name} f ON o.file_id = f.id
-        WHERE o.id = ?
+        self._write(self._delete, obs_id)
+
+    def _delete(self, obs_id: int):
+        """
+        Runs `delete` on the writer thread.
         """
+        # 1) Delete the memory, the trigger deletes its embeddings and file row
         try:
-            row = self.conn.execute(select_file_sql, (obs_id,)).fetchone()
-            if not row:
-                logger.info(
-                    f"No memory found with id={obs_id}. Nothing to delete."
-                )
-                return
+            with self.conn:
+                row = self._cursor.execute(self._sql_del_obs, (obs_id,)).fetchone()
         except sqlite3.Error as e:
-            logger.error(f"Error fetching memory to delete: {e}")
+            logger.error(f"Error deleting memory (id={obs_id}): {e}")
             raise
 
-        file_id = row["file_id"]
-        file_ref = row["ref"]
+        if not row:
+            logger.info(
+                f"No memory found with id={obs_id}. Nothing to delete."
+            )
+            return
 
-        # 2) Delete from memories_vec
-        sql_vec_del = f"DELETE FROM {self.memory_vector_table_name} WHERE id = ?"
-        # 3) Delete from memories
-        sql_obs_del = f"DELETE FROM {self.memory_table_name} WHERE id = ?"
+        file_id, file_ref = row
 
         try:
-            with self.conn:
-                self.conn.execute(sql_vec_del, (obs_id,))
-                self.conn.execute(sql_obs_del, (obs_id,))
-        except sqlite3.Error as e:
-            logger.error(f"Error deleting memory (id={obs_id}): {e}")
-            raise
+            with self._hnsw_lock:
+                self._hnsw.mark_deleted(obs_id)
+                self._hnsw_live_count -= 1
+        except RuntimeError:
+            pass  # Not in the index
+        else:
+            self._count_index_changes(1)
 
-        # 4) If there's a file, remove it from DB and local storage
-        if file_id is not None:
+        # 2) If there's a file, remove it from local storage
+        if file_ref:
             try:
-                if file_ref:
-                    self.local_storage.delete_file(file_ref)
-                sql_file_del = f"DELETE FROM {self.files_table_name} WHERE id = ?"
-                with self.conn:
-                    self.conn.execute(sql_file_del, (file_id,))
+                self._wait_for_write(file_ref)
+                self.local_storage.delete_file(file_ref)
                 logger.info(
                     f"Deleted file id={file_id} ref={file_ref} from DB/storage."
                 )
-            except sqlite3.Error as e:
-                logger.error(f"Error deleting file reference (id={file_id}): {e}")
-                raise
             except Exception as e:
                 logger.error(f"Error deleting physical file '{file_ref}': {e}")
                 raise
@@ -380,66 +1352,111 @@ class MemoryManager:
     #
     def _select_similar(
         self,
-        query_vector: List[float],
+        query_vector: np.ndarray,
         top_k: int = 4,
         output_types: Optional[List[MemoryOutputType]] = None,
-    ) -> List[Dict[str, Any]]:
+        output_weights: Optional[Dict[MemoryOutputType, float]] = None,
+    ) -> List[Hit]:
         """
-        Performs a similarity (k-NN) search using the `memories_vec` virtual table
-        and returns up to `top_k` matches, joined with `memories` + `files`.
+        Performs a similarity (k-NN) search and returns up to `top_k` matches,
+        joined with `memories` + `files`.
+
+        The search runs in two stages: the int8 `memories_vec_i8` table yields
+        `top_k * rerank_factor` candidates, which are then ranked by their exact
+        float32 distance from `memories_vec`. Once `ann_threshold` embeddings are
+        stored, the candidates come from the HNSW index instead.
 
         :param query_vector: The query vector (length = self.vector_dim).
         :param top_k:        The number of top similar results to retrieve.
         :param output_types: Which output memory types to include in the results
                              (e.g. [MemoryOutputType.TEXT, MemoryOutputType.IMAGE]).
                              If None or empty, returns all.
-        :return:             A list of dicts, each containing joined row + `distance`.
+        :param output_weights: Optional distance multipliers per output type, e.g.
+                             {MemoryOutputType.IMAGE: 0.8} to favour images. All
+                             re-ranked candidates are then ordered by their weighted
+                             distance, which is added as `weighted_distance`.
+        :return:             A list of Hits, each containing joined row + `distance`.
         """
-        if len(query_vector) != self.vector_dim:
-            raise ValueError(
-                f"Query vector length ({len(query_vector)}) != vector_dim ({self.vector_dim})."
-            )
+        query_vector = self._check_embedding(query_vector, "Query vector")
 
-        # Build query
-        query_str = "[" + ", ".join(str(x) for x in query_vector) + "]"
+        # Weighted searches keep every re-ranked candidate, weighting can reorder them
+        limit = top_k * self.rerank_factor if output_weights else top_k
 
-        base_sql = f"""
-        SELECT
-            o.id AS memory_id,
-            o.timestamp,
-            o.text,
-            f.id AS file_id,
-            f.type AS file_type,
-            f.ref AS file_ref,
-            distance(ov.embedding, :query) AS distance
-        FROM {self.memory_vector_table_name} ov
-        JOIN {self.memory_table_name} o ON o.id = ov.id
-        LEFT JOIN {self.files_table_name} f ON o.file_id = f.id
-        WHERE ov.embedding MATCH :query
-          AND k = :top_k
-        """
+        # Build query
+        query_blob = self._serialize_embedding(query_vector)
+        candidates = top_k * self.rerank_factor
 
-        # Build filter for output_types
-        filter_sql = self._build_output_type_filter(output_types)
-        base_sql += filter_sql
+        # Pick the statements specialized for output_types
+        output_types = frozenset(MemoryOutputType(t) for t in output_types or ())
+        sql, ann_sql = self._sql_sel_similar_variants[output_types]
 
-        base_sql += """
-        ORDER BY distance
-        LIMIT :top_k
+        indexed_count = self._hnsw_live_count
+        if indexed_count >= self.ann_threshold:
+            k = min(candidates, indexed_count)
+            try:
+                with self._hnsw_lock:
+                    self._hnsw.set_ef(max(64, k))
+                    labels, _ = self._hnsw.knn_query(
+                        np.asarray(query_vector, dtype=np.float32), k=k
+                    )
+            except RuntimeError as e:
+                # Raised when fewer than k live elements are left, scan instead
+                logger.debug(f"HNSW query failed, falling back to a scan: {e}")
+            else:
+                results = self._fetch_similar(
+                    ann_sql,
+                    {
+                        "query": query_blob,
+                        "candidate_ids": json.dumps(labels[0].tolist()),
+                        "top_k": limit,
+                    },
+                )
+                # The index knows nothing about output types, so a filtered search
+                # that comes up short is repeated with the exhaustive int8 scan.
+                if len(results) >= top_k or not output_types:
+                    return self._apply_output_weights(results, output_weights, top_k)
+
+        params: Dict[str, Any] = {
+            "query": query_blob,
+            "query_i8": self._quantize_embedding(query_vector),
+            "top_k": limit,
+            "candidates": candidates,
+        }
+        results = self._fetch_similar(sql, params)
+        return self._apply_output_weights(results, output_weights, top_k)
+
+    @staticmethod
+    def _apply_output_weights(
+        results: List[Hit],
+        output_weights: Optional[Dict[MemoryOutputType, float]],
+        top_k: int,
+    ) -> List[Hit]:
         """
+        Orders the results by their distance times the weight of their output type and
+        keeps the best `top_k`. Without weights the results are returned unchanged.
+        The distances are exact already (computed by sqlite-vec in C), so this only
+        reorders a few dozen rows.
+        """
+        if not output_weights:
+            return results
+        weights = {MemoryOutputType(t): w for t, w in output_weights.items()}
+        results = [
+            hit._replace(
+                weighted_distance=hit.distance
+                * weights.get(MemoryOutputType(hit.file_type or MemoryOutputType.TEXT), 1.0)
+            )
+            for hit in results
+        ]
+        results.sort(key=lambda hit: hit.weighted_distance)
+        return results[:top_k]
 
-        params: Dict[str, Any] = {"query": query_str, "top_k": top_k}
-
+    def _fetch_similar(self, sql: str, params: Dict[str, Any]) -> List[Hit]:
+        """
+        Runs a similarity search statement and returns its rows as Hits.
+        """
         try:
-            cur = self.conn.cursor()
-            cur.execute(base_sql, params)
-            rows = cur.fetchall()
-            results = []
-            for r in rows:
-                row_dict = dict(r)
-                row_dict["distance"] = float(row_dict["distance"])
-                results.append(row_dict)
-            return results
+            with self._reader() as conn:
+                return [Hit(*row) for row in conn.execute(sql, params)]
         except sqlite3.Error as e:
             logger.error(f"Error during similarity search: {e}")
             raise
@@ -481,54 +1498,54 @@ class MemoryManager:
     #
     def select_similar(
         self,
-        data: Union[str, Image.Image, BytesIO],
+        data: Union[str, Image.Image, np.ndarray, BytesIO],
         top_k: int = 4,
         output_types: Optional[List[MemoryOutputType]] = None,
-    ) -> List[Dict[str, Any]]:
+        output_weights: Optional[Dict[MemoryOutputType, float]] = None,
+    ) -> List[Hit]:
         """
         Convenience method to perform similarity search from one of:
           - A text string
           - A PIL image
+          - A uint8 RGB array of shape [H, W, 3] (an image, embedded without PIL)
           - A BytesIO object (assumed to be audio)
 
         Internally detects type, calls the appropriate embedding helper method,
-        then calls _select_similar with the resulting vector.
+        then calls _select_similar with the resulting vector. See `_select_similar`
+        for `output_types` and `output_weights`.
         """
-        # 1) Determine input type
+        # 1) Determine input type and embed it into a float32 vector
         if isinstance(data, str):
             # Text
             try:
-                embed_tensor = self.embedding_helper.create_text_embedding(data)
+                query_vector = self._embed(MemoryOutputType.TEXT, data, cache=False)
             except Exception as e:
                 raise Exception(f"Error embedding query text: {e}")
 
-        elif isinstance(data, Image.Image):
-            # PIL image
+        elif isinstance(data, (Image.Image, np.ndarray)):
+            # PIL image or RGB array
             try:
-                embed_tensor = self.embedding_helper.create_image_embedding(data)
+                query_vector = self._embed(MemoryOutputType.IMAGE, data, cache=False)
             except Exception as e:
                 raise Exception(f"Error embedding query image: {e}")
 
         elif isinstance(data, BytesIO):
             # Audio
             try:
-                embed_tensor = self.embedding_helper.create_audio_embedding(data)
+                query_vector = self._embed(MemoryOutputType.AUDIO, data, cache=False)
             except Exception as e:
                 raise Exception(f"Error embedding query audio: {e}")
 
         else:
             raise ValueError(
-                "Unsupported data type. Please pass str (text), PIL.Image.Image, or BytesIO (audio)."
+                "Unsupported data type. Please pass str (text), PIL.Image.Image or np.ndarray (image), "
+                "or BytesIO (audio)."
             )
 
-        # 2) Convert embedding tensor to a Python list
-        if len(embed_tensor.shape) == 2:
-            query_vector = embed_tensor[0].tolist()
-        else:
-            query_vector = embed_tensor.tolist()
-
-        # 3) Perform similarity search
-        return self._select_similar(query_vector, top_k=top_k, output_types=output_types)
+        # 2) Perform similarity search
+        return self._select_similar(
+            query_vector, top_k=top_k, output_types=output_types, output_weights=output_weights
+        )
 
 
 #
@@ -572,8 +1589,8 @@ if __name__ == "__main__":
     print("\nSimilarity search (text query) results:")
     for r in results_text:
         print(
-            f"ObsID={r['memory_id']}, Distance={r['distance']:.4f}, "
-            f"FileType={r['file_type']}, Content={r['text']}"
+            f"ObsID={r.memory_id}, Distance={r.distance:.4f}, "
+            f"FileType={r.file_type}, Content={r.text}"
         )
 
     # -- Single convenience method for similarity (image example)
@@ -585,8 +1602,8 @@ if __name__ == "__main__":
     print("\nSimilarity search (image query) results:")
     for r in results_image:
         print(
-            f"ObsID={r['memory_id']}, Distance={r['distance']:.4f}, "
-            f"FileType={r['file_type']}, Content={r['text']}"
+            f"ObsID={r.memory_id}, Distance={r.distance:.4f}, "
+            f"FileType={r.file_type}, Content={r.text}"
         )
 
     # -- Single convenience method for similarity (audio example)
@@ -599,8 +1616,8 @@ if __name__ == "__main__":
     print("\nSimilarity search (audio query) results:")
     for r in results_audio:
         print(
-            f"ObsID={r['memory_id']}, Distance={r['distance']:.4f}, "
-            f"FileType={r['file_type']}, Content={r['text']}"
+            f"ObsID={r.memory_id}, Distance={r.distance:.4f}, "
+            f"FileType={r.file_type}, Content={r.text}"
         )
 
     # Cleanup
@@ -8,6 +8,9 @@ class MessageRole(Enum):
 
 
 class Message(dict):
+    # Slots instead of an instance __dict__ next to the dict itself
+    __slots__ = ("role", "content", "_litellm")
+
     role: str
     content: str
 
@@ -16,18 +19,34 @@ class Message(dict):
 
         self.role = role.value
         self.content = content
+        self._litellm = None
+
+    def as_litellm(self) -> dict:
+        """
+        Returns the message in litellm's format. The dict is built on first use and
+        reused afterwards, agents resend the same messages on every turn.
+        """
+        if self._litellm is None:
+            self._litellm = {"role": self.role, "content": self.content}
+        return self._litellm
 
 
 class SystemMessage(Message):
+    __slots__ = ()
+
     def __init__(self, content: str):
         super().__init__(MessageRole.SYSTEM, content)
 
 
 class UserMessage(Message):
+    __slots__ = ()
+
     def __init__(self, content: str):
         super().__init__(MessageRole.USER, content)
 
 
 class AssistantMessage(Message):
+    __slots__ = ()
+
     def __init__(self, content: str):
         super().__init__(MessageRole.ASSISTANT, content)
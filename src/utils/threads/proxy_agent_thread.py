@@ -135,6 +135,10 @@ class ProxyAgentThread:
         self.memory_agent_thread_manager.stop()
         logging.debug("MemoryAgentThreadManager stopped.")
 
+        # Saves the HNSW index and closes the database once no agent uses it anymore
+        self.memory_manager.close()
+        logging.debug("MemoryManager closed.")
+
         logging.info("ProxyAgentThread stopped.")
 
     def _run(self):